@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+from instrumentation import count
+
+# ================= 标准科目表：科目名 → 标准科目 ID =================
+# chart_of_accounts.json 登记每个标准科目（键即 ID，也是页面上的标准名称）的全部已知别名，
+# 以及规范化时剥离的编号前缀（一、 / (一) / 其中: …）和单位后缀（(万元) / (%) …）。
+# 报表载入后每个科目名只规范化一次，之后按 ID 查找都是字典命中；未登记的科目名退回编辑距离匹配，
+# 只接受唯一一个距离为 1 的候选，结果按规范化后的科目名缓存。
+# 每个科目还可登记 search / exclude：报表中没有任何行能映射到该科目时，按这些关键词做子串查找兜底。
+
+REGISTRY_PATH = os.environ.get("FINANCE_COPILOT_ACCOUNTS",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "chart_of_accounts.json"))
+# 规范化后不少于该长度的科目名才做编辑距离匹配：“应收账款 / 应付账款” 这类短科目名只差一个字
+FUZZY_MIN_LENGTH = 8
+FUZZY_CACHE_SIZE = 4096
+_WHITESPACE = re.compile(r'\s+')
+
+def within_one_edit(a, b):
+    """a、b 的编辑距离是否不超过 1（一次插入、删除或替换）"""
+    if len(a) > len(b): a, b = b, a
+    if len(b) - len(a) > 1: return False
+    for i, (x, y) in enumerate(zip(a, b)):
+        if x != y:
+            return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+    return True
+
+class AccountRegistry:
+    """标准科目表：别名按规范化后的文本建成字典，resolve 为 O(1) 查找"""
+
+    def __init__(self, data):
+        rules = data["normalize"]
+        # 前缀、后缀各合并为一个正则，未带编号与单位的科目名每轮只需两次匹配
+        self._strip_patterns = [re.compile("|".join(f"(?:{p})" for p in rules[part])) for part in ("prefixes", "suffixes")]
+        self.accounts = data["accounts"]
+        self.aliases = {}
+        for account_id, entry in self.accounts.items():
+            for alias in [account_id] + entry.get("aliases", []):
+                owner = self.aliases.setdefault(self.normalize(alias), account_id)
+                if owner != account_id: raise ValueError(f"别名 '{alias}' 同时登记在 '{owner}' 与 '{account_id}' 下")
+        # 编辑距离候选按长度分桶，并预先算好字符集合用于快速排除
+        self._by_length = {}
+        for alias in self.aliases: self._by_length.setdefault(len(alias), []).append((alias, set(alias)))
+        self._fuzzy = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._fuzzy_match)
+
+    def normalize(self, label):
+        """全角转半角（NFKC）、去空白、转小写，再反复剥离编号前缀与单位后缀"""
+        text = _WHITESPACE.sub('', unicodedata.normalize("NFKC", str(label))).lower()
+        changed = True
+        while changed:
+            changed = False
+            for pattern in self._strip_patterns:
+                stripped = pattern.sub("", text)
+                if stripped and stripped != text: text, changed = stripped, True
+        return text
+
+    def resolve(self, label):
+        """科目名 → 标准科目 ID；别名表未命中时退回编辑距离匹配，仍无法确定时返回 None"""
+        key = self.normalize(label)
+        account_id = self.aliases.get(key)
+        if account_id is not None or len(key) < FUZZY_MIN_LENGTH: return account_id
+        return self._fuzzy(key)
+
+    def _fuzzy_match(self, key):
+        count("accounts.fuzzy_match")
+        chars = set(key)
+        found = set()
+        for length in (len(key) - 1, len(key), len(key) + 1):
+            for alias, alias_chars in self._by_length.get(length, ()):
+                # 一次编辑最多使两边的字符集合相差 2 个字符
+                if len(chars ^ alias_chars) <= 2 and within_one_edit(key, alias):
+                    found.add(self.aliases[alias])
+        # 同时接近两个不同科目（如 现金流入小计 / 现金流出小计）时不做猜测
+        return found.pop() if len(found) == 1 else None
+
+    def search_keywords(self, account_id):
+        """兜底子串查找用的 (关键词, 排除关键词)，缺省为标准名称与全部别名"""
+        entry = self.accounts[account_id]
+        return entry.get("search", [account_id] + entry.get("aliases", [])), entry.get("exclude")
+
+@lru_cache(maxsize=None)
+def load_registry(path=REGISTRY_PATH):
+    with open(path, encoding="utf-8") as f:
+        return AccountRegistry(json.load(f))
@@ -0,0 +1,744 @@
+import re
+import weakref
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from itertools import accumulate
+
+import numpy as np
+import pandas as pd
+
+from accounts import load_registry
+from instrumentation import count, stage
+from notes import build_context_map
+from statement_model import (StatementModel, describe_changes, describe_changes_matrix, frame_periods, join_periods,
+                             period_columns, safe_pct_array, share_array)
+
+# ================= 分析引擎：纯计算，不依赖 Streamlit =================
+
+class AnalysisError(Exception):
+    """分析无法进行（如找不到合计行），消息直接展示给用户"""
+
+@dataclass
+class ChapterResult:
+    """单个章节的分析结果"""
+    tables: dict = field(default_factory=dict)     # Word 表格标题 -> 展示用 DataFrame
+    texts: dict = field(default_factory=dict)      # 综述小节标题 -> 文案
+    variance: list = field(default_factory=list)   # [(科目标题, 变动分析文案)]
+
+def safe_pct(num, denom):
+    return (num / denom * 100) if denom != 0 and pd.notna(num) and pd.notna(denom) else 0.0
+
+class SubjectIndex:
+    """🔥 科目索引：每张报表构建一次，预先规范化科目名并建立字符 n-gram 倒排表，查找结果缓存复用
+
+    报表以弱引用持有，索引不会延长报表的生命周期；报表载入后不应再原地修改科目列。
+    """
+
+    def __init__(self, df):
+        self._df_ref = weakref.ref(df)
+        # 与旧逻辑一致：科目名去掉全部空白后匹配，包含匹配不区分大小写
+        self.clean_names = [re.sub(r'\s+', '', str(x)) for x in df.index]
+        self._lower_names = [n.lower() for n in self.clean_names]
+        self._exact = {}
+        for pos, name in enumerate(self.clean_names): self._exact.setdefault(name, []).append(pos)
+        # 重复科目名：按 label 分组，df.loc[label] 会返回该组全部行
+        self._has_duplicates = not df.index.is_unique
+        if self._has_duplicates:
+            codes, _ = pd.factorize(df.index)
+            self._codes = codes
+            self._group_order = np.argsort(codes, kind='stable')
+            self._group_sizes = np.bincount(codes)
+            self._group_starts = np.cumsum(self._group_sizes) - self._group_sizes
+        # 单字 + 双字倒排表：包含查询只需校验候选行，不再逐行扫描
+        self._grams = {}
+        for pos, name in enumerate(self._lower_names):
+            for g in set(name) | {name[k:k + 2] for k in range(len(name) - 1)}:
+                self._grams.setdefault(g, set()).add(pos)
+        # 标准科目：全部科目名一次规范化映射为标准科目 ID，之后按 ID 查找都是字典命中
+        registry = load_registry()
+        self._accounts = {}
+        for pos, label in enumerate(df.index):
+            account_id = registry.resolve(label)
+            if account_id is not None: self._accounts.setdefault(account_id, []).append(pos)
+        self._non_zeros = None
+        self._joined = None
+        self._contains_cache = {}
+        self._best_cache = {}
+
+    @property
+    def df(self):
+        return self._df_ref()
+
+    def contains(self, keyword):
+        """包含 keyword 的行位置（升序）"""
+        kw = keyword.replace(" ", "").lower()
+        hit = self._contains_cache.get(kw)
+        if hit is not None: return hit
+        if not kw:
+            hit = np.arange(len(self.clean_names))
+        else:
+            grams = [kw] if len(kw) == 1 else [kw[k:k + 2] for k in range(len(kw) - 1)]
+            postings = sorted((self._grams.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings[0] else set()
+            hit = np.array(sorted(pos for pos in candidates if kw in self._lower_names[pos]), dtype=np.intp)
+        self._contains_cache[kw] = hit
+        return hit
+
+    def match_mask(self, keyword, exclude_keywords=None):
+        """精确匹配 | (包含匹配 & ~排除关键词)，返回整张报表的布尔掩码"""
+        mask = np.zeros(len(self.clean_names), dtype=bool)
+        mask[self.contains(keyword)] = True
+        for ex_kw in exclude_keywords or ():
+            mask[self.contains(ex_kw)] = False
+        mask[self._exact.get(keyword.replace(" ", ""), [])] = True
+        return mask
+
+    def non_zero_counts(self):
+        """各行各期中非零且非空的期数（一次 NumPy 归约）"""
+        if self._non_zeros is None:
+            block = self.df[frame_periods(self.df)].to_numpy(dtype=float)
+            self._non_zeros = np.count_nonzero((block != 0) & ~np.isnan(block), axis=1)
+        return self._non_zeros
+
+    def _expand_duplicates(self, positions):
+        """与 df.loc[label] 一致：每个命中位置展开为同名 label 的全部行位置"""
+        if not self._has_duplicates or len(positions) == 0: return positions
+        groups = self._codes[positions]
+        sizes = self._group_sizes[groups]
+        offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        return self._group_order[np.repeat(self._group_starts[groups], sizes) + offsets]
+
+    def first_positions(self, keywords):
+        """{关键词: 首个包含该关键词的行位置}，与 contains(kw)[0] 一致；未命中的关键词不在结果中
+
+        全部科目名以换行拼成一段文本，每个关键词只需一次 C 层 str.find，再由偏移量换算行位置。
+        """
+        if self._joined is None:
+            # 文本与偏移量作为一个元组一次赋值，并发调用时不会读到只建好一半的缓存
+            self._joined = ("\n".join(self._lower_names),
+                            list(accumulate((len(name) + 1 for name in self._lower_names[:-1]), initial=0)))
+        joined, offsets = self._joined
+        found = {}
+        for kw in keywords:
+            at = joined.find(kw.replace(" ", "").lower())
+            if at >= 0 and self._lower_names: found[kw] = bisect_right(offsets, at) - 1
+        return found
+
+    def account_rows(self, account_id):
+        """映射到该标准科目的全部行位置（升序）"""
+        return self._accounts.get(account_id, [])
+
+    def account_position(self, account_id):
+        """标准科目所在行：同一科目有多行时取非零期数最多者（并列取先出现者）；
+        没有任何行映射到该科目时，退回按科目表登记的关键词子串查找"""
+        positions = self._accounts.get(account_id)
+        if positions:
+            count("account.hit")
+            return positions[int(np.argmax(self.non_zero_counts()[positions]))]
+        count("account.fallback")
+        return self.best_position(*load_registry().search_keywords(account_id))
+
+    def first_account_positions(self, account_ids):
+        """{标准科目: 首次出现的行位置}；没有行映射到的科目退回关键词首次出现的位置（按关键词顺序取第一个命中的）"""
+        found = {}
+        registry = load_registry()
+        for account_id in account_ids:
+            if account_id in self._accounts:
+                found[account_id] = self._accounts[account_id][0]
+                continue
+            keywords, _ = registry.search_keywords(account_id)
+            hits = self.first_positions(keywords)
+            pos = next((hits[kw] for kw in keywords if kw in hits), None)
+            if pos is not None: found[account_id] = pos
+        return found
+
+    def best_position(self, keywords, exclude_keywords=None):
+        """按关键词顺序排列候选行，argmax 取非零期数最多的行位置（并列取先出现者）"""
+        key = (tuple(keywords), tuple(exclude_keywords or ()))
+        if key in self._best_cache:
+            count("best_position.hit")
+            return self._best_cache[key]
+        count("best_position.miss")
+        candidates = np.concatenate([self._expand_duplicates(np.flatnonzero(self.match_mask(kw, exclude_keywords)))
+                                     for kw in keywords] or [np.empty(0, dtype=np.intp)])
+        best_pos = None
+        if len(candidates):
+            best_pos = int(candidates[np.argmax(self.non_zero_counts()[candidates])])
+        self._best_cache[key] = best_pos
+        return best_pos
+
+_SUBJECT_INDEXES = {}
+
+def get_subject_index(df):
+    """同一张报表只构建一次 SubjectIndex，报表被释放后自动移除"""
+    key = id(df)
+    index = _SUBJECT_INDEXES.get(key)
+    if index is None or index.df is not df:
+        count("subject_index.build")
+        index = SubjectIndex(df)
+        _SUBJECT_INDEXES[key] = index
+        weakref.finalize(df, _SUBJECT_INDEXES.pop, key, None)
+    return index
+
+def find_row_fuzzy(df, keywords, exclude_keywords=None, default_val=None):
+    count("find_row_fuzzy")
+    if isinstance(keywords, str): keywords = [keywords]
+    best_pos = get_subject_index(df).best_position(keywords, exclude_keywords)
+    if best_pos is not None: return df.iloc[best_pos]
+    if default_val is not None: return default_val
+    return pd.Series(0, index=df.columns)
+
+def find_account(df, account_id, default_val=None):
+    """按标准科目 ID 取行，缺省值规则同 find_row_fuzzy"""
+    count("find_account")
+    pos = get_subject_index(df).account_position(account_id)
+    if pos is not None: return df.iloc[pos]
+    if default_val is not None: return default_val
+    return pd.Series(0, index=df.columns)
+
+def smart_scale_convert(values, subject_name="", is_ebitda=False, is_ratio=False):
+    """按科目名中的单位或数值量级换算为万元 / 百分数；values 为各期数值，返回同长度数组"""
+    values = np.asarray(values, dtype=float)
+    values = np.where(np.isnan(values) | (values == 0), 0.0, values)
+    if "亿元" in subject_name: return values * 10000.0
+    if "万元" in subject_name: return values
+    if "元" in subject_name: return values / 10000.0
+    if is_ebitda: return np.where(np.abs(values) > 1000000, values / 10000.0, values)
+    if is_ratio: return np.where(np.abs(values) < 1.0, values * 100.0, values)
+    return values
+
+# ================= 业务逻辑：资产 / 负债结构 =================
+def share_column_names(n):
+    """结构表各期占比列名：以空格区分，避免与日期列及彼此重名"""
+    base = ["占比(%) ", "占比(%)", " 占比(%)"]
+    return [base[j] if j < len(base) else " " * (j - 1) + "占比(%)" for j in range(n)]
+
+def analyze_structure(df_raw, word_data_list, total_account, analysis_name, d_labels):
+    """total_account 为合计行的标准科目（资产总计 / 负债合计）"""
+    periods = period_columns(len(d_labels))
+    if analysis_name == "负债":
+        # 负债表只分析到负债合计行，其后的所有者权益部分不计入
+        total_rows = get_subject_index(df_raw).account_rows(total_account)
+        if total_rows: df_raw = df_raw.iloc[:total_rows[-1] + 1]
+
+    total_row = find_account(df_raw, total_account)
+    if total_row.sum() == 0 and total_row.name is None:
+         raise AnalysisError(f"未找到合计行：{total_account}")
+    total_vals = total_row[periods].to_numpy(dtype=float)
+
+    # 过滤掉各期数据全为0的行（保留标题行，即含冒号的）
+    model = StatementModel.from_frame(df_raw, d_labels)
+    mask_title = df_raw.index.astype(str).str.contains(r'[:：]')
+    keep = model.non_zero_mask() | mask_title
+    df = df_raw[keep].copy()
+    shares = share_array(model.values[keep], total_vals[None, :])
+    for j, period in enumerate(periods): df[f'占比_{period}'] = shares[:, j]
+
+    result = ChapterResult()
+
+    # 1. 明细数据表
+    final_df = pd.DataFrame(index=df.index)
+    for j, (period, share_col) in enumerate(zip(periods, share_column_names(len(periods)))):
+        final_df[f"{d_labels[j]}"] = df[period].apply(lambda x: f"{x:,.2f}")
+        final_df[share_col] = (df[f'占比_{period}'] * 100).apply(lambda x: f"{x:.2f}")
+
+    # 清空以冒号结尾的标题行数据
+    for idx in final_df.index:
+        if str(idx).strip().endswith("：") or str(idx).strip().endswith(":"):
+            final_df.loc[idx] = ""
+    result.tables[f"{analysis_name}结构情况表"] = final_df
+
+    # 2. 综述文案
+    def amounts(row): return join_periods(row[periods])
+    def pcts(row): return join_periods(safe_pct_array(row[periods], total_vals), "{:.2f}%")
+
+    top_5 = df.sort_values(by='T', ascending=False).head(5).index.tolist()
+    text = ""
+    if analysis_name == "资产":
+        curr_row = find_account(df_raw, "流动资产合计")
+        non_curr_row = find_account(df_raw, "非流动资产合计")
+        text = (f"报告期内，发行人资产总额分别为{amounts(total_row)}。\n\n"
+                f"其中，流动资产金额分别为{amounts(curr_row)}，"
+                f"占总资产的比例分别为{pcts(curr_row)}；\n\n"
+                f"非流动资产金额分别为{amounts(non_curr_row)}，"
+                f"占总资产的比例分别为{pcts(non_curr_row)}。\n\n"
+                f"在总资产构成中，公司资产主要为 **{'、'.join(top_5)}** 等。")
+    elif analysis_name == "负债":
+        curr_row = find_account(df_raw, "流动负债合计")
+        non_curr_row = find_account(df_raw, "非流动负债合计")
+        changes = describe_changes(total_vals, d_labels, "{label}发行人负债较{prev}{dir}{amount:,.2f}万元，{tag}{pct:.2f}%",
+                                   first_template="{label}较{prev}{dir}{amount:,.2f}万元，{tag}{pct:.2f}%")
+        # 只有一期时没有变动与趋势可描述
+        trend = ""
+        if len(periods) > 1:
+            trend_desc = "增长" if total_vals[0] - total_vals[1] >= 0 else "下降"
+            trend = f"{changes}。报告期内发行人的负债规模呈现{trend_desc}态势，主要原因为发行人（用户自行分析）。\n\n"
+        text = (f"报告期内，发行人负债总额分别为{amounts(total_row)}。\n\n"
+                f"{trend}"
+                f"从负债结构来看，报告期内，流动负债分别为{amounts(curr_row)}，"
+                f"占负债总额比例分别为{pcts(curr_row)}，"
+                f"主要由 **{'、'.join(top_5)}** 等构成；\n\n"
+                f"非流动负债分别为{amounts(non_curr_row)}，"
+                f"占负债总额比例分别为{pcts(non_curr_row)}。")
+    result.texts[f"{analysis_name}综述文案"] = text
+
+    # 3. 变动分析文案：按行位置整批生成（重名科目各自成段），变动额、增幅、方向词一次向量运算
+    exclude_list = ['合计', '总计', '总额']
+    major = df[(df['占比_T'] > 0.01) & (~df.index.str.contains('|'.join(exclude_list)))]
+    major_subjects = major.index.tolist()
+    denom_text = "总资产" if analysis_name == "资产" else f"{analysis_name}总额"
+    # 所有科目的附注上下文一次扫描取得，循环内直接查表
+    with stage("find_context"):
+        contexts = build_context_map(major_subjects, word_data_list)
+    with stage("variance_texts"):
+        result.variance = structure_variance(major_subjects, major[periods].to_numpy(dtype=float),
+                                             major[[f'占比_{p}' for p in periods]].to_numpy(dtype=float),
+                                             d_labels, denom_text, contexts)
+    return result
+
+STRUCTURE_CHANGE_TEMPLATE = "{label}末，发行人{subject}较{prev}末{dir}{amount:,.2f}万元，{tag}{pct:.2f}%"
+
+def structure_variance(subjects, values, shares, d_labels, denom_text, contexts):
+    """资产 / 负债结构变动分析文案（批量）：values、shares 为 科目数 × 期数 矩阵，返回 [(标题, 文案)]"""
+    changes = describe_changes_matrix(values, d_labels, STRUCTURE_CHANGE_TEMPLATE, fields={'subject': subjects})
+    # 逐行只做字符串拼接，数值先整体转为 Python 列表
+    variance = []
+    for subject, vals, pcts, change_text, latest_share in zip(subjects, values.tolist(), (shares * 100).tolist(),
+                                                              changes, shares[:, 0].tolist()):
+        # 生成变动分析文案
+        analysis_text = (f"报告期各期末，发行人{subject}余额分别为{join_periods(vals)}，"
+                       f"占{denom_text}的比例分别为{join_periods(pcts, '{:.2f}%')}。\n\n"
+                       f"{change_text}。\n\n"
+                       f"变动主要原因为：（请在此处补充具体的业务原因，例如：业务规模扩大/缩减、新增/偿还款项等）。")
+
+        # 如果有附注上下文，展示在下方供参考
+        ctx = contexts.get(subject)
+        if ctx:
+            analysis_text += f"\n\n【参考附注信息】\n{ctx}"
+
+        variance.append((f"{subject} (占比 {latest_share:.2%} @ {d_labels[0]})", analysis_text))
+    return variance
+
+# ================= 业务逻辑：现金流量 =================
+# ================= 现金流量表分段 =================
+# 三类活动：(标识, 活动标题, 流入小计, 流出小计, 净额)，均为标准科目
+CASH_FLOW_ACTIVITIES = [
+    ("operating", "经营活动产生的现金流量", "经营活动现金流入小计", "经营活动现金流出小计", "经营活动产生的现金流量净额"),
+    ("investing", "投资活动产生的现金流量", "投资活动现金流入小计", "投资活动现金流出小计", "投资活动产生的现金流量净额"),
+    ("financing", "筹资活动产生的现金流量", "筹资活动现金流入小计", "筹资活动现金流出小计", "筹资活动产生的现金流量净额"),
+]
+CASH_FLOW_NET_INCREASE = "现金及现金等价物净增加额"
+# 占比表的六段：(活动, 流向, 标题, 段首, 小计)；流入段自活动标题起，流出段自流入小计起，均以本段小计为分母
+CASH_FLOW_SECTIONS = [
+    ("operating", "inflow", "一、经营活动现金流入构成", "经营活动产生的现金流量", "经营活动现金流入小计"),
+    ("operating", "outflow", "二、经营活动现金流出构成", "经营活动现金流入小计", "经营活动现金流出小计"),
+    ("investing", "inflow", "三、投资活动现金流入构成", "投资活动产生的现金流量", "投资活动现金流入小计"),
+    ("investing", "outflow", "四、投资活动现金流出构成", "投资活动现金流入小计", "投资活动现金流出小计"),
+    ("financing", "inflow", "五、筹资活动现金流入构成", "筹资活动产生的现金流量", "筹资活动现金流入小计"),
+    ("financing", "outflow", "六、筹资活动现金流出构成", "筹资活动现金流入小计", "筹资活动现金流出小计"),
+]
+
+class CashFlowSegments:
+    """🔥 现金流量表分段：按标准科目定位段界，标出每行所属的活动段（经营 / 投资 / 筹资 × 流入 / 流出）
+
+    section[i] 为第 i 行所属段在 CASH_FLOW_SECTIONS 中的序号，不属于任何段为 -1；
+    subtotals[k] 为第 k 段小计行的位置（未找到为 None）。段首、段尾各取该标准科目首次出现的行，
+    段内为两者之间的行；报表中没有行映射到段界科目时，按科目表登记的关键词查找。
+    """
+
+    def __init__(self, df):
+        self.df = df
+        account_ids = [account_id for *_, start, total in CASH_FLOW_SECTIONS for account_id in (start, total)]
+        account_ids += [net for *_, net in CASH_FLOW_ACTIVITIES] + [CASH_FLOW_NET_INCREASE]
+        self.positions = get_subject_index(df).first_account_positions(dict.fromkeys(account_ids))
+        self.section = np.full(len(df), -1, dtype=np.intp)
+        self.subtotals = []
+        for k, (_, _, _, start_id, total) in enumerate(CASH_FLOW_SECTIONS):
+            start = self.positions.get(start_id)
+            end = self.positions.get(total)
+            self.subtotals.append(end)
+            if start is not None and end is not None and end > start:
+                self.section[start + 1:end] = k
+
+    def row(self, account_id):
+        """标准科目首次出现的行（Series）；未找到时返回全 0 行，与 find_row_fuzzy 的缺省一致"""
+        pos = self.positions.get(account_id)
+        return self.df.iloc[pos] if pos is not None else pd.Series(0, index=self.df.columns)
+
+def calculate_cash_flow_percentages(df_raw, d_labels, segments=None):
+    segments = segments or CashFlowSegments(df_raw)
+    periods = period_columns(len(d_labels))
+    values = df_raw[periods].to_numpy(dtype=float)
+    # 段内科目（空白、过短的科目名除外）整体一次除以各自所在段的小计
+    named = np.array([isinstance(s, str) and len(s.strip()) >= 2 for s in df_raw.index], dtype=bool)
+    rows = np.flatnonzero((segments.section >= 0) & named)
+    rows = rows[np.argsort(segments.section[rows], kind="stable")]   # 按段排列，段内保持报表顺序
+    sections = segments.section[rows]
+    denoms = values[[segments.subtotals[k] for k in sections]].reshape(len(rows), len(periods))
+    pcts = safe_pct_array(values[rows], denoms).tolist()
+    subjects = df_raw.index[rows].tolist()
+
+    blank = [""] * len(periods)
+    data_list = []
+    bounds = np.searchsorted(sections, np.arange(len(CASH_FLOW_SECTIONS) + 1))
+    for k, (_, _, cat_name, _, _) in enumerate(CASH_FLOW_SECTIONS):
+        data_list.append([cat_name] + blank)
+        # 把 % 放在表头，单元格内仅显示数字
+        data_list += [[subjects[i]] + [f"{p:.2f}" for p in pcts[i]] for i in range(bounds[k], bounds[k + 1])]
+    # 表头增加 (%)
+    return pd.DataFrame(data_list, columns=["项目"] + [f"{d}占比(%)" for d in d_labels]).set_index("项目")
+
+def cash_flow_summary(segments, d_labels):
+    """现金流量表摘要：各活动的流入 / 流出小计与净额，行位置取自分段结果"""
+    periods = period_columns(len(d_labels))
+    data_list = []
+    for _, heading, in_total, out_total, net in CASH_FLOW_ACTIVITIES:
+        data_list.append([f"{heading}："] + [""] * len(periods))
+        for name in (in_total, out_total, net):
+            data_list.append([name] + [f"{v:,.2f}" for v in segments.row(name)[periods]])
+    data_list.append([CASH_FLOW_NET_INCREASE] + [f"{v:,.2f}" for v in segments.row(CASH_FLOW_NET_INCREASE)[periods]])
+    return pd.DataFrame(data_list, columns=["项目"] + list(d_labels)).set_index("项目")
+
+def analyze_cash_flow(df_raw, word_data_list, d_labels):
+    periods = period_columns(len(d_labels))
+    # 分段一次，摘要表、占比表与文案中的小计 / 净额共用同一份分段结果
+    segments = CashFlowSegments(df_raw)
+    result = ChapterResult()
+    result.tables["现金流量表摘要"] = cash_flow_summary(segments, d_labels)
+    result.tables["现金流量占比表"] = calculate_cash_flow_percentages(df_raw, d_labels, segments)
+
+    op_in_total = segments.row("经营活动现金流入小计")
+    op_out_total = segments.row("经营活动现金流出小计")
+    op_net = segments.row("经营活动产生的现金流量净额")
+    op_sales = find_account(df_raw, "销售商品、提供劳务收到的现金")
+    op_other_in = find_account(df_raw, "收到其他与经营活动有关的现金")
+    op_buy = find_account(df_raw, "购买商品、接受劳务支付的现金")
+    op_other_out = find_account(df_raw, "支付其他与经营活动有关的现金")
+    inv_net = segments.row("投资活动产生的现金流量净额")
+    inv_in_total = segments.row("投资活动现金流入小计")
+    inv_out_total = segments.row("投资活动现金流出小计")
+    inv_buy_asset = find_account(df_raw, "购建固定资产、无形资产和其他长期资产支付的现金")
+    fin_net = segments.row("筹资活动产生的现金流量净额")
+    fin_in_total = segments.row("筹资活动现金流入小计")
+    fin_borrow_in = find_account(df_raw, "取得借款收到的现金")
+    fin_invest_in = find_account(df_raw, "吸收投资收到的现金")
+    fin_out_total = segments.row("筹资活动现金流出小计")
+    fin_repay = find_account(df_raw, "偿还债务支付的现金")
+    fin_interest = find_account(df_raw, "分配股利、利润或偿付利息支付的现金")
+
+    def amounts(row, last="和"): return join_periods(row[periods], last=last)
+    def pcts(row, denom_row): return join_periods(safe_pct_array(row[periods], denom_row[periods]), "{:.2f}%", "及")
+    labels_text = join_periods(d_labels, "{}", "及")
+
+    text_op = (f"报告期内，发行人经营活动现金流入分别为{amounts(op_in_total)}。\n\n"
+             f"其中，销售商品、提供劳务收到的现金分别为{amounts(op_sales, '及')}，"
+             f"占经营活动现金流入的{pcts(op_sales, op_in_total)}；\n\n"
+             f"收到其他与经营活动有关的现金分别为{amounts(op_other_in, '及')}，"
+             f"占经营活动现金流入的{pcts(op_other_in, op_in_total)}。"
+             f"发行人收到其他与经营活动有关的现金主要包括【】。\n\n")
+    text_op += (f"报告期内，发行人经营活动现金流出分别为{amounts(op_out_total)}。\n\n"
+              f"报告期内，发行人经营活动现金流出主要来源于【】。"
+              f"报告期内，发行人购买商品、接受劳务支付的现金分别为{amounts(op_buy, '及')}，"
+              f"占经营活动现金流出的{pcts(op_buy, op_out_total)}。\n\n"
+              f"发行人支付其他与经营活动有关的现金分别为{amounts(op_other_out, '及')}，"
+              f"占经营活动现金流出的{pcts(op_other_out, op_out_total)}。"
+              f"支付其他与经营活动有关的现金包括：【】。\n\n")
+    text_op += (f"报告期内，发行人经营活动产生的现金流量净额分别为{amounts(op_net)}，"
+              f"主要系【】所致。")
+    result.texts["1、经营活动产生的现金流量分析"] = text_op
+
+    text_inv = (f"报告期内，发行人投资活动产生的现金流量净额分别为{amounts(inv_net)}。\n\n"
+              f"投资活动现金流入分别为{amounts(inv_in_total, '及')}；"
+              f"投资活动现金流出分别为{amounts(inv_out_total, '及')}，"
+              f"其中购建固定资产、无形资产和其他长期资产支付的现金分别为{amounts(inv_buy_asset, '及')}，"
+              f"占投资活动现金流出的{pcts(inv_buy_asset, inv_out_total)}。\n\n"
+              f"发行人投资活动现金流量净额【】，主要是发行人【】所致。")
+    result.texts["2、投资活动产生的现金流量分析"] = text_inv
+
+    text_fin = (f"报告期内，发行人筹资活动产生的现金流量净额分别为{amounts(fin_net)}。\n\n"
+              f"报告期内筹资活动产生的现金流量净额【】，主要系【】所致。\n\n")
+    text_fin += (f"筹资活动现金流入方面，发行人筹资活动现金流入主要由【】构成。"
+               f"{labels_text}，发行人筹资活动产生的现金流入分别为{amounts(fin_in_total, '及')}，"
+               f"其中取得借款收到的现金分别为{amounts(fin_borrow_in, '及')}；"
+               f"吸收投资收到的现金分别为{amounts(fin_invest_in, '及')}。\n\n")
+    text_fin += (f"{labels_text}，发行人筹资活动产生的现金流出分别为{amounts(fin_out_total)}。"
+               f"发行人筹资活动现金流出主要由【】构成。"
+               f"其中报告期内，发行人偿还债务支付的现金分别为{amounts(fin_repay)}，"
+               f"分配股利、利润或偿付利息所支付的现金分别为{amounts(fin_interest)}。")
+    result.texts["3、筹资活动产生的现金流量分析"] = text_fin
+
+    # 变动分析：三类净额先全部取出，再整批计算变动并套模板
+    target_subjects = ["经营活动产生的现金流量净额", "投资活动产生的现金流量净额", "筹资活动产生的现金流量净额"]
+    found = [(subject, row) for subject in target_subjects
+             for row in [segments.row(subject)] if row.name is not None]
+    subjects = [subject for subject, _ in found]
+    values = np.array([row[periods].to_numpy(dtype=float) for _, row in found]).reshape(-1, len(periods))
+    # 按要求格式化文案：逐期变动额与增幅
+    changes = describe_changes_matrix(values, d_labels, CASH_FLOW_CHANGE_TEMPLATE, sep="；\n", fields={'subject': subjects})
+    for subject, vals, change_text in zip(subjects, values, changes):
+        cf_text = (f"报告期各期，发行人{subject}分别为{join_periods(vals)}。\n\n"
+                 f"{change_text}。\n\n"
+                 f"变动主要原因为：（请在此处补充具体的业务或资金变动原因）。")
+        result.variance.append((subject, cf_text))
+    return result
+
+CASH_FLOW_CHANGE_TEMPLATE = "截至{label}，发行人{subject}较{prev}净{dir}{amount:,.2f}万元，{tag}{pct:.2f}%"
+
+# ================= 业务逻辑：盈利能力分析 =================
+# 盈利能力分析表的标准科目及查找关键词（按表格顺序）
+PROFIT_ITEMS = ["营业收入", "营业成本", "销售费用", "管理费用", "研发费用", "财务费用", "其他收益",
+                "营业利润", "营业外收入", "营业外支出", "利润总额", "净利润"]
+PROFIT_EXPENSE_ITEMS = ["销售费用", "管理费用", "研发费用", "财务费用"]
+# 各期均为 0 时在表格中隐藏的科目 (其他收益 已移除，确保显示)
+PROFIT_HIDE_IF_ZERO = {"销售费用", "管理费用", "研发费用", "财务费用", "营业外收入", "营业外支出"}
+# 期间费用明细所在区段：营业总成本 之后、资产减值损失 / 投资收益 之前
+EXPENSE_BLOCK_START = "营业总成本"
+EXPENSE_BLOCK_END = ["资产减值损失", "投资收益"]
+
+class ProfitLines:
+    """🔥 利润表一次解析：每个标准科目只查找一次行位置，各期数值整块取出，期间费用明细区段同时确定
+
+    values[科目] 为各期数值（最新一期在前，未找到为 0）；expense_names / expense_block 为期间费用明细。
+    表格、比率与文案都从这里取数，不再对同一科目反复模糊查找。
+    """
+
+    def __init__(self, df, periods):
+        subject_index = get_subject_index(df)
+        block = df[periods].to_numpy(dtype=float)
+        self.positions = {item: subject_index.account_position(item) for item in PROFIT_ITEMS}
+        self.values = {item: block[pos] if pos is not None else np.zeros(len(periods))
+                       for item, pos in self.positions.items()}
+
+        first = subject_index.first_account_positions([EXPENSE_BLOCK_START] + EXPENSE_BLOCK_END)
+        start = first.get(EXPENSE_BLOCK_START)
+        end = next((first[item] for item in EXPENSE_BLOCK_END if item in first), None)
+        # 与原逻辑一致：区段起点在第 0 行时同样视为未找到
+        if start and end and end > start:
+            # 区段内名称含“费用”的行，排除 "利息费用"
+            rows = [pos for pos, name in enumerate(df.index[start + 1:end].tolist(), start + 1)
+                    if "费用" in str(name) and "利息" not in str(name)]
+        else:
+            # Fallback if structure not found
+            rows = [self.positions[item] for item in PROFIT_EXPENSE_ITEMS if self.positions[item] is not None]
+        self.expense_names = df.index[rows].tolist()
+        self.expense_block = block[rows].reshape(-1, len(periods))
+
+def analyze_profitability(df_raw, word_data_list, d_labels):
+    periods = period_columns(len(d_labels))
+    n = len(periods)
+    lines = ProfitLines(df_raw, periods)
+
+    # 提取基础数据用于后续计算
+    rev = lines.values['营业收入']
+    cost = lines.values['营业成本']
+    margins = share_array(rev - cost, rev) * 100
+
+    # 构建表格数据列表：标准科目按顺序输出，营业毛利率紧随净利润之后
+    data_list = []
+    for item, vals in lines.values.items():
+        # 如果费用类科目各期均为0，则隐藏该行
+        if item in PROFIT_HIDE_IF_ZERO and (vals == 0).all(): continue
+        # 格式化
+        data_list.append([item] + [f"{v:,.2f}" if v != 0 else "0.00" for v in vals])
+    data_list.append(["营业毛利率"] + [f"{m:.2f}" for m in margins])
+    # 暂无数据，留空
+    data_list.append(["平均总资产回报率"] + [""] * n)
+
+    # 转 DataFrame
+    df_fmt = pd.DataFrame(data_list, columns=["项目"] + list(d_labels))
+    df_fmt.set_index("项目", inplace=True)
+
+    # 重新计算期间费用总额 (文案用)
+    exp_items = PROFIT_EXPENSE_ITEMS
+    exp_values = {ex: lines.values[ex] for ex in exp_items}
+    period_expenses = np.zeros(n)
+    for ex in exp_items: period_expenses = period_expenses + exp_values[ex]
+    pe_ratios = share_array(period_expenses, rev) * 100
+
+    expense_names = lines.expense_names
+    expense_block = lines.expense_block
+    # 用于计算合计：逐行累加，与逐期求和的结果一致
+    expense_sums = np.zeros(n)
+    for vals in expense_block: expense_sums = expense_sums + vals
+
+    def interleave(values, pcts):
+        # 把 % 放在表头，单元格内仅显示数字
+        return [cell for v, p in zip(values, pcts) for cell in (f"{v:,.2f}", f"{p:.2f}")]
+
+    # 构建期间费用分析表格数据
+    pe_pcts = share_array(expense_block, period_expenses[None, :]) * 100
+    period_exp_data = [[name] + interleave(vals, pcts) for name, vals, pcts in zip(expense_names, expense_block, pe_pcts)]
+    # 添加期间费用合计行
+    period_exp_data.append(["期间费用合计"] + [cell for s in expense_sums for cell in (f"{s:,.2f}", "100.00")])
+
+    # 表头增加 (%)
+    pe_cols = ["项目"] + [col for d in d_labels for col in (f"{d}金额", f"{d}占期间费用比例(%)")]
+
+    df_period_exp = pd.DataFrame(period_exp_data, columns=pe_cols).set_index("项目")
+
+    # 🟢 [新增]：构建第二张表：期间费用占营业收入比例
+    rev_pcts = safe_pct_array(expense_block, rev[None, :])
+    period_exp_rev_data = [[name] + interleave(vals, pcts) for name, vals, pcts in zip(expense_names, expense_block, rev_pcts)]
+    # 添加合计行
+    period_exp_rev_data.append(["期间费用合计"] + interleave(expense_sums, safe_pct_array(expense_sums, rev)))
+
+    # 定义列名
+    pe_rev_cols = ["项目"] + [col for d in d_labels for col in (f"{d}金额", f"{d}占营收比例(%)")]
+
+    df_period_exp_rev = pd.DataFrame(period_exp_rev_data, columns=pe_rev_cols).set_index("项目")
+
+    result = ChapterResult()
+    result.tables["盈利能力分析表"] = df_fmt
+    result.tables["期间费用分析表"] = df_period_exp
+    result.tables["期间费用占营收分析表"] = df_period_exp_rev
+
+    text_1 = (f"报告期内，发行人各期的营业收入分别为{join_periods(rev)}，"
+              f"营业成本分别为{join_periods(cost)}，"
+              f"营业毛利率分别为{join_periods(margins, '{:.2f}%')}。\n\n"
+              f"发行人以（）为主要业务，主要业务毛利水平较稳定。")
+    result.texts["1、营业收入、营业成本和毛利率分析"] = text_1
+
+    text_2 = (f"报告期内，发行人期间费用总额分别为{join_periods(period_expenses)}，"
+              f"占发行人营业收入的比例分别为{join_periods(pe_ratios, '{:.2f}%')}。\n\n"
+              f"报告期内，发行人期间费用主要为销售费用、管理费用、研发费用和财务费用，最近两年发行人期间费用较为稳定。\n\n")
+
+    # 分项分析
+    for name in exp_items:
+        vals = exp_values[name]
+        text_2 += (f"报告期内，发行人发生{name}分别为{join_periods(vals)}，"
+                   f"占期间费用的比例分别为{join_periods(safe_pct_array(vals, period_expenses), '{:.2f}%')}，"
+                   f"占营业收入的比重分别为{join_periods(safe_pct_array(vals, rev), '{:.2f}%')}。\n\n")
+    result.texts["2、期间费用分析"] = text_2
+
+    # 1. 收入分析：按要求格式化文案：增加/减少 + 增幅/降幅
+    rev_changes = describe_changes(rev, d_labels, "{label}营业收入较{prev}{dir}{amount:,.2f}万元，{tag}{pct:.2f}%", sep="；\n")
+    rev_text = (f"报告期内，发行人营业收入分别为{join_periods(rev)}。\n"
+                f"{rev_changes}。\n"
+                f"变动主要原因为：（请结合业务规模、订单量、单价等因素分析）。")
+    result.variance.append(("营业收入", rev_text))
+
+    # 2. 毛利率分析
+    margin_text = (f"报告期各期，发行人毛利率分别为{join_periods(margins, '{:.2f}%', '、')}。\n"
+                   f"发行人毛利率变动主要系：（请结合成本波动、产品定价策略等因素分析）。")
+    result.variance.append(("毛利率", margin_text))
+
+    # 3. 净利润分析
+    net = lines.values['净利润']
+    net_text = (f"报告期各期，发行人净利润分别为{join_periods(net)}。\n"
+                f"净利润变动趋势与利润总额变动趋势一致，变动原因主要为：（请补充非经常性损益或税务影响等原因）。")
+    result.variance.append(("净利润", net_text))
+    return result
+
+# ================= 业务逻辑：财务指标分析 =================
+def analyze_ratios(df_raw, word_data_list, d_labels):
+    periods = period_columns(len(d_labels))
+    zeros = np.zeros(len(periods))
+
+    # 🔥 (显示名称, 标准科目)；别名与排除关键词（如 EBITDA 排除比率类）登记在 chart_of_accounts.json
+    metrics_config = [
+        ("资产负债率（%）", "资产负债率"),
+        ("流动比率（倍）", "流动比率"),
+        ("速动比率（倍）", "速动比率"),
+        ("EBITDA（万元）", "EBITDA"),
+        ("EBITDA利息保障倍数（倍）", "EBITDA利息保障倍数"),
+    ]
+
+    data_list = []
+    series = {}
+
+    for display_name, account_id in metrics_config:
+        row = find_account(df_raw, account_id)
+
+        vals = zeros
+        if row.name is not None:
+            # 🔥 核心修正：应用智能单位转换（各期一次向量运算）
+            is_ebitda = "EBITDA（万元）" in display_name
+            is_ratio = "资产负债率" in display_name
+
+            # 传入 subject_name 帮助判断单位
+            vals = smart_scale_convert(row[periods], row.name, is_ebitda, is_ratio)
+            series[display_name] = vals
+
+        fmt = "{:,.2f}" if "EBITDA（万元）" in display_name else "{:.2f}"
+        data_list.append([display_name] + [fmt.format(v) for v in vals])
+
+    df_display = pd.DataFrame(data_list, columns=["项目"] + list(d_labels))
+    df_display.set_index("项目", inplace=True)
+
+    result = ChapterResult()
+    result.tables["主要财务指标表"] = df_display
+
+    alr = series.get("资产负债率（%）", zeros)
+    cr = series.get("流动比率（倍）", zeros)
+    qr = series.get("速动比率（倍）", zeros)
+    ebitda = series.get("EBITDA（万元）", zeros)
+    int_cov = series.get("EBITDA利息保障倍数（倍）", zeros)
+
+    text = "1、资产负债率\n\n"
+    text += f"报告期内，发行人的资产负债率分别为{join_periods(alr, '{:.2f}%')}。\n\n"
+
+    text += "2、流动比率及速动比率\n\n"
+    text += (f"报告期内，发行人的流动比率分别为{join_periods(cr, '{:.2f}倍')}；"
+             f"报告期内，发行人的速动比率分别为{join_periods(qr, '{:.2f}倍')}。\n\n")
+
+    text += "3、EBITDA利息保障倍数\n\n"
+    text += (f"报告期内，发行人EBITDA分别为{join_periods(ebitda)}，"
+             f"发行人EBITDA利息保障倍数分别为{join_periods(int_cov, '{:.2f}倍')}。")
+    result.texts["偿债能力分析综述"] = text
+
+    prompts = [("资产负债率", alr), ("流动比率", cr), ("EBITDA", ebitda)]
+    for name, data in prompts:
+        # 根据最近两期的趋势判断描述；只有一期时没有可比较的上期
+        trend_text = ""
+        if len(data) < 2: trend_text = "（仅一期数据，无法比较变动）"
+        elif data[0] > data[1]: trend_text = "有所上升"
+        elif data[0] < data[1]: trend_text = "有所下降"
+        else: trend_text = "保持稳定"
+
+        analysis_text = (f"报告期各期，发行人{name}分别为{join_periods(data, '{:.2f}')}。\n"
+                       f"报告期内，发行人{name}{trend_text}，主要系：（请结合资产负债结构或盈利能力分析）。")
+        result.variance.append((name, analysis_text))
+    return result
+
+# ================= 章节调度 =================
+# 章节 key -> 页面/输出目录名称，与 SHEET_CONFIG 的 key 一致
+CHAPTERS = {
+    "asset": "(一) 资产结构分析",
+    "liab": "(二) 负债结构分析",
+    "cash": "(三) 现金流量分析",
+    "ratios": "(四) 财务指标分析",
+    "profit": "(五) 盈利能力分析",
+}
+
+def analyze_chapter(key, df_raw, d_labels, word_data_list=None):
+    """按章节 key 运行对应的分析，返回 ChapterResult"""
+    word_data_list = word_data_list or []
+    if key == "asset": return analyze_structure(df_raw, word_data_list, "资产总计", "资产", d_labels)
+    if key == "liab": return analyze_structure(df_raw, word_data_list, "负债合计", "负债", d_labels)
+    if key == "cash": return analyze_cash_flow(df_raw, word_data_list, d_labels)
+    if key == "ratios": return analyze_ratios(df_raw, word_data_list, d_labels)
+    if key == "profit": return analyze_profitability(df_raw, word_data_list, d_labels)
+    raise ValueError(f"未知章节：{key}")
+
+def run_chapter(key, df_raw, d_labels, word_data_list=None):
+    """运行单个章节并把异常转成提示文字，返回 (ChapterResult, None) 或 (None, 错误信息)"""
+    try:
+        with stage(f"analyze[{key}]"):
+            return analyze_chapter(key, df_raw, d_labels, word_data_list), None
+    except AnalysisError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"数据处理错误: {e}"
+
+def analyze_workbook(workbook, word_data_list=None, on_chapter=None):
+    """对 parse_workbook 的结果跑全部章节，返回 {章节 key: (ChapterResult, 错误信息)}
+
+    on_chapter(i, key) 在开始第 i 个章节前调用，用于汇报进度。
+    """
+    results = {}
+    for i, key in enumerate(CHAPTERS):
+        if on_chapter: on_chapter(i, key)
+        df_raw, d_labels, err = workbook[key]
+        if df_raw is None: results[key] = (None, f"读取失败：{err}")
+        else: results[key] = run_chapter(key, df_raw, d_labels, word_data_list)
+    return results
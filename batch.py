@@ -0,0 +1,88 @@
+"""批量生成：对一个文件夹下的全部 Excel 底稿跑五个章节，输出 Word 表格、Excel 表格和文案
+
+用法（在仓库根目录）：python batch.py 底稿目录 输出目录 [--workers 8]
+每本底稿输出到 输出目录/<底稿名>/<章节名>/ 下：每张表一份 .docx 和 .xlsx，章节文案汇总为 文案.txt
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from analysis_engine import CHAPTERS, analyze_workbook
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, parse_workbook
+from exporters import create_word_table_file, create_excel_file
+
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+def write_chapter(result, chapter_dir):
+    """写出一个章节的表格与文案，返回写出的文件数"""
+    chapter_dir.mkdir(parents=True, exist_ok=True)
+    for title, df in result.tables.items():
+        (chapter_dir / f"{title}.docx").write_bytes(create_word_table_file(df, title=title).getvalue())
+        (chapter_dir / f"{title}.xlsx").write_bytes(create_excel_file(df).getvalue())
+
+    lines = []
+    for heading, text in result.texts.items():
+        lines += [f"【{heading}】", text, ""]
+    if result.variance:
+        lines += ["【变动分析文案】", ""]
+        for title, text in result.variance:
+            lines += [f"📌 {title}", text, ""]
+    (chapter_dir / "文案.txt").write_text("\n".join(lines), encoding="utf-8")
+    return len(result.tables) * 2 + 1
+
+def process_workbook(path, out_root):
+    """子进程入口：解析一本底稿并输出全部章节，返回 (写出文件数, 问题列表)"""
+    path = Path(path)
+    workbook = parse_workbook(str(path), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    out_dir = Path(out_root) / path.stem
+    n_files, problems = 0, []
+    for key, (result, err) in analyze_workbook(workbook).items():
+        if err:
+            problems.append(f"{CHAPTERS[key]}：{err}")
+            continue
+        n_files += write_chapter(result, out_dir / CHAPTERS[key])
+    return n_files, problems
+
+def find_workbooks(in_dir):
+    # 跳过 Excel 打开文件时生成的 ~$ 锁文件
+    return sorted(p for p in Path(in_dir).iterdir()
+                  if p.suffix.lower() in EXCEL_SUFFIXES and not p.name.startswith("~$"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir", help="Excel 底稿所在目录")
+    parser.add_argument("output_dir", help="输出目录")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="并行进程数（默认 CPU 核数）")
+    args = parser.parse_args()
+
+    paths = find_workbooks(args.input_dir)
+    if not paths:
+        print(f"❌ {args.input_dir} 下没有 Excel 底稿")
+        return 1
+
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_workbook, str(p), args.output_dir): p for p in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                n_files, problems = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(paths)}] ❌ {path.name}：{e}")
+                continue
+            status = "⚠️" if problems else "✅"
+            print(f"[{done}/{len(paths)}] {status} {path.name}：输出 {n_files} 个文件")
+            for problem in problems:
+                print(f"      - {problem}")
+            if problems: failed += 1
+
+    print(f"完成 {len(paths)} 本底稿，用时 {time.perf_counter() - start:.1f}s，{failed} 本存在问题")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""附注上下文检索基准：逐科目 re.finditer vs 字典树一次扫描
+
+用法（在仓库根目录）：python benchmarks/bench_context.py [--subjects 30 200] [--chars 300000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notes import build_context_map
+from synthetic import CURRENT_ASSETS, NON_CURRENT_ASSETS, CURRENT_LIABS, NON_CURRENT_LIABS, EQUITY
+
+FILLER = "本公司按照企业会计准则编制财务报表，报告期内经营情况良好，主要客户包括多家大型企业集团。"
+
+
+def legacy_context_map(subjects, word_data_list):
+    """原实现：每个科目对每份附注各做一次 re.finditer"""
+    result = {}
+    for subject in subjects:
+        clean_sub = subject.replace(" ", "")
+        found_contexts = []
+        for item in word_data_list:
+            content = item['content']
+            matches = list(re.finditer(re.escape(clean_sub), content))
+            if matches:
+                file_context = [f"...{content[max(0, m.start() - 300):min(len(content), m.start() + 800)].replace(chr(10), ' ')}..."
+                                for m in matches[:3]]
+                found_contexts.append(f"📄 **来源：{item['source']}**\n" + "\n\n----------\n\n".join(file_context))
+        if found_contexts: result[subject] = "\n\n====================\n\n".join(found_contexts)
+    return result
+
+
+def make_notes(subjects, n_chars, seed):
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < n_chars:
+        piece = FILLER
+        if rng.random() < 0.05: piece = rng.choice(subjects) + "期末余额较期初变动，主要系业务增长所致。"
+        parts.append(piece)
+        size += len(piece) + 1
+    return [{'source': "附注.docx", 'content': "\n".join(parts)}]
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[30, 200])
+    parser.add_argument("--chars", type=int, default=300000, help="附注正文字数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    real = CURRENT_ASSETS + NON_CURRENT_ASSETS + CURRENT_LIABS + NON_CURRENT_LIABS + EQUITY
+    print(f"{'科目数':>6} {'逐科目(ms)':>12} {'一次扫描(ms)':>14} {'加速比':>8}  输出一致")
+    for n_subjects in args.subjects:
+        subjects = (real + [f"明细科目{i}号" for i in range(n_subjects)])[:n_subjects]
+        docs = make_notes(subjects, args.chars, n_subjects)
+        slow, slow_map = best_of(lambda: legacy_context_map(subjects, docs), args.repeat)
+        fast, fast_map = best_of(lambda: build_context_map(subjects, docs), args.repeat)
+        print(f"{n_subjects:>6} {slow * 1000:>12.1f} {fast * 1000:>14.1f} {slow / fast:>7.1f}x  {slow_map == fast_map}")
+
+
+if __name__ == "__main__":
+    main()
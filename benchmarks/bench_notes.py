@@ -0,0 +1,66 @@
+"""附注读取基准：python-docx 对象模型 vs 流式解析 document.xml，对比用时与峰值内存
+
+用法（在仓库根目录）：python benchmarks/bench_notes.py [--paragraphs 3000] [--tables 100 300] [--repeat 3]
+峰值内存为 tracemalloc 统计的 Python 堆分配，不含 lxml 底层 libxml2 的分配。
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+from docx import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from notes import load_word_docx, stream_load_word
+
+
+def make_notes_docx(n_paragraphs, n_tables, rows=12, cols=6):
+    """构造附注式文档：大量正文段落 + 带横向、纵向合并单元格的明细表"""
+    doc = Document()
+    for i in range(n_paragraphs):
+        doc.add_paragraph(f"（{i}）应收账款按账龄披露：本公司按照整个存续期预期信用损失计量坏账准备，详见附注五。")
+    for t in range(n_tables):
+        table = doc.add_table(rows=rows, cols=cols)
+        for r in range(rows):
+            for c in range(cols):
+                table.cell(r, c).text = f"科目{t}-{r}" if c == 0 else f"{(t + 1) * (r + 1) * (c + 1):,.2f}"
+        table.cell(0, 1).merge(table.cell(0, 2))
+        table.cell(1, 0).merge(table.cell(3, 0))
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio
+
+
+def measure(func, bio, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(bio)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    value = func(bio)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=3000)
+    parser.add_argument("--tables", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'表格数':>6} {'docx(ms)':>10} {'流式(ms)':>10} {'加速比':>7} {'docx峰值(MB)':>13} {'流式峰值(MB)':>13}  输出一致")
+    for n_tables in args.tables:
+        bio = make_notes_docx(args.paragraphs, n_tables)
+        slow, slow_peak, (slow_text, _, _) = measure(load_word_docx, bio, args.repeat)
+        fast, fast_peak, fast_text = measure(stream_load_word, bio, args.repeat)
+        print(f"{n_tables:>6} {slow * 1000:>10.1f} {fast * 1000:>10.1f} {slow / fast:>6.1f}x "
+              f"{slow_peak / 2**20:>13.1f} {fast_peak / 2**20:>13.1f}  {slow_text == fast_text}")
+
+
+if __name__ == "__main__":
+    main()
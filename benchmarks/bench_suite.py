@@ -0,0 +1,149 @@
+"""全流程基准：用合成底稿分阶段计时（读取、规整、科目查找、各章节计算、Word/Excel 导出），结果写入 JSON
+
+用法（在仓库根目录）：
+    python benchmarks/bench_suite.py [--rows 50 200 1000] [--helper-cols 4] [--dup-names 10]
+                                     [--ratio-header-rows 0 2 6] [--lookups 2000] [--repeat 3] [--out bench.json]
+不同版本各跑一次后对比 JSON 中各阶段的 best_ms 即可发现性能回退。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_engine import CHAPTERS, find_row_fuzzy, run_chapter
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, fuzzy_load_excel, load_statement_sheet, parse_workbook
+from exporters import create_word_table_file, create_excel_file
+from synthetic import make_workbook
+
+STATEMENT_KEYS = ["asset", "liab", "profit", "cash"]
+
+
+def measure(func, repeat):
+    """运行 repeat 次，返回 {best_ms, mean_ms} 与最后一次的返回值"""
+    times, value = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        times.append(time.perf_counter() - start)
+    return {"best_ms": round(min(times) * 1000, 3), "mean_ms": round(sum(times) / len(times) * 1000, 3)}, value
+
+
+def lookup_keywords(df, n_lookups):
+    """按底稿中实际存在的科目轮流查找，外加一个不存在的科目覆盖查找失败路径"""
+    subjects = [s for s in df.index.astype(str).unique() if s] + ["不存在的科目"]
+    return [[subjects[i % len(subjects)]] for i in range(n_lookups)]
+
+
+def bench_workbook(path, args):
+    stages = {}
+
+    def load_legacy():
+        for key in STATEMENT_KEYS + ["ratios"]:
+            fuzzy_load_excel(path, SHEET_CONFIG[key], DEFAULT_HEADER_ROW)
+    stages["fuzzy_load_excel"], _ = measure(load_legacy, args.repeat)
+
+    def load_clean():
+        with pd.ExcelFile(path) as xl:
+            for key in STATEMENT_KEYS:
+                load_statement_sheet(xl, SHEET_CONFIG[key], DEFAULT_HEADER_ROW)
+    stages["load_statement_sheet"], _ = measure(load_clean, args.repeat)
+
+    stages["parse_workbook"], workbook = measure(
+        lambda: parse_workbook(path, SHEET_CONFIG, DEFAULT_HEADER_ROW), args.repeat)
+
+    df_asset = workbook["asset"][0]
+    keywords = lookup_keywords(df_asset, args.lookups)
+
+    def lookups():
+        # 每轮复制底稿，科目索引从零建立
+        df = df_asset.copy()
+        for kw in keywords: find_row_fuzzy(df, kw)
+    stages["find_row_fuzzy"], _ = measure(lookups, args.repeat)
+    stages["find_row_fuzzy"]["calls"] = len(keywords)
+
+    results = {}
+    for key in CHAPTERS:
+        df_raw, d_labels, err = workbook[key]
+        if df_raw is None:
+            stages[f"analyze_{key}"] = {"error": err}
+            continue
+        stages[f"analyze_{key}"], (result, err) = measure(
+            lambda: run_chapter(key, df_raw.copy(), d_labels), args.repeat)
+        # 章节计算失败（如重名科目触发的异常）记入结果而不中断整轮基准
+        if err: stages[f"analyze_{key}"]["error"] = err
+        else: results[key] = result
+
+    tables = [(title, df) for result in results.values() for title, df in result.tables.items()]
+
+    def export_word():
+        for title, df in tables: create_word_table_file(df, title=title)
+    def export_excel():
+        for _, df in tables: create_excel_file(df)
+    stages["export_word"], _ = measure(export_word, args.repeat)
+    stages["export_excel"], _ = measure(export_excel, args.repeat)
+    stages["export_word"]["tables"] = stages["export_excel"]["tables"] = len(tables)
+
+    sizes = {key: len(entry[0]) for key, entry in workbook.items() if entry[0] is not None}
+    return stages, sizes
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 200, 1000], help="每张报表的填充科目数")
+    parser.add_argument("--helper-cols", type=int, default=4, help="G 列之后的辅助列数")
+    parser.add_argument("--dup-names", type=int, default=10, help="每张报表的重名科目数")
+    parser.add_argument("--ratio-header-rows", type=int, nargs="+", default=[0, 2, 6], help="财务指标表头所在行（0 起），按底稿轮流使用")
+    parser.add_argument("--lookups", type=int, default=2000, help="find_row_fuzzy 调用次数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "repeat": args.repeat,
+        },
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, n_rows in enumerate(args.rows):
+            params = {"rows": n_rows, "helper_cols": args.helper_cols, "dup_names": args.dup_names,
+                      "ratio_header_row": args.ratio_header_rows[i % len(args.ratio_header_rows)]}
+            path = make_workbook(os.path.join(tmp, f"synthetic_{n_rows}.xlsx"), n_rows=n_rows,
+                                 helper_cols=args.helper_cols, dup_names=args.dup_names,
+                                 ratio_header_row=params["ratio_header_row"], seed=n_rows)
+            params["file_kb"] = round(os.path.getsize(path) / 1024, 1)
+            stages, sizes = bench_workbook(path, args)
+            report["runs"].append({"params": params, "sheet_rows": sizes, "stages": stages})
+
+            print(f"--- rows={n_rows} ({params['file_kb']} KB, 财务指标表头第 {params['ratio_header_row']} 行)")
+            for name, stat in stages.items():
+                line = f"  {name:<22} {stat['best_ms']:>10.1f} ms" if "best_ms" in stat else f"  {name:<22}"
+                print(f"{line}  ❌ {stat['error']}" if "error" in stat else line)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""变动分析文案基准：逐科目 df.loc + 标量计算 + 长 f-string vs 整批向量运算 + 模板
+
+用法（在仓库根目录）：python benchmarks/bench_variance.py [--subjects 100 500 2000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_engine import safe_pct, structure_variance
+from statement_model import period_columns
+
+
+def legacy_variance(df, major_subjects, d_labels, denom_text, contexts):
+    """原实现（三期）：逐科目 df.loc 取行，逐期标量计算变动额、增幅与方向词后拼接长 f-string"""
+    d_t, d_t1, d_t2 = d_labels
+    variance = []
+    for subject in major_subjects:
+        row = df.loc[subject]
+        diff_prev = row['T_1'] - row['T_2']
+        pct_prev = safe_pct(diff_prev, row['T_2'])
+        dir_prev = "增加" if diff_prev >= 0 else "减少"
+        label_prev = "增幅" if diff_prev >= 0 else "降幅"
+        diff_curr = row['T'] - row['T_1']
+        pct_curr = safe_pct(diff_curr, row['T_1'])
+        dir_curr = "增加" if diff_curr >= 0 else "减少"
+        label_curr = "增幅" if diff_curr >= 0 else "降幅"
+        analysis_text = (f"报告期各期末，发行人{subject}余额分别为{row['T_2']:,.2f}万元、{row['T_1']:,.2f}万元和{row['T']:,.2f}万元，"
+                       f"占{denom_text}的比例分别为{row['占比_T_2']*100:.2f}%、{row['占比_T_1']*100:.2f}%和{row['占比_T']*100:.2f}%。\n\n"
+                       f"{d_t1}末，发行人{subject}较{d_t2}末{dir_prev}{abs(diff_prev):,.2f}万元，{label_prev}{abs(pct_prev):.2f}%；"
+                       f"{d_t}末，发行人{subject}较{d_t1}末{dir_curr}{abs(diff_curr):,.2f}万元，{label_curr}{abs(pct_curr):.2f}%。\n\n"
+                       f"变动主要原因为：（请在此处补充具体的业务原因，例如：业务规模扩大/缩减、新增/偿还款项等）。")
+        ctx = contexts.get(subject)
+        if ctx: analysis_text += f"\n\n【参考附注信息】\n{ctx}"
+        variance.append((f"{subject} (占比 {row['占比_T']:.2%} @ {d_labels[0]})", analysis_text))
+    return variance
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subjects", type=int, nargs="+", default=[100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    d_labels = ["2024年末", "2023年末", "2022年末"]
+    periods = period_columns(len(d_labels))
+    share_cols = [f"占比_{p}" for p in periods]
+    print(f"{'科目数':>6} {'逐科目(ms)':>12} {'整批(ms)':>10} {'加速比':>8}  输出一致")
+    for n_subjects in args.subjects:
+        subjects = [f"科目{i}" for i in range(n_subjects)]
+        values = rng.uniform(-1e6, 1e7, size=(n_subjects, len(periods)))
+        values[rng.random(values.shape) < 0.05] = 0
+        shares = values / values.sum(axis=0)
+        df = pd.DataFrame(np.hstack([values, shares]), index=subjects, columns=periods + share_cols)
+        slow, slow_out = best_of(lambda: legacy_variance(df, subjects, d_labels, "总资产", {}), args.repeat)
+        fast, fast_out = best_of(lambda: structure_variance(subjects, df[periods].to_numpy(dtype=float),
+                                                            df[share_cols].to_numpy(dtype=float), d_labels, "总资产", {}),
+                                 args.repeat)
+        print(f"{n_subjects:>6} {slow * 1000:>12.1f} {fast * 1000:>10.1f} {slow / fast:>7.1f}x  {slow_out == fast_out}")
+
+
+if __name__ == "__main__":
+    main()
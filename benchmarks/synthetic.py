@@ -0,0 +1,147 @@
+"""按 SHEET_CONFIG 版式生成合成审计底稿，供基准测试使用
+
+报表 Sheet 第 3 行为表头，A 列科目、B~D 列附注/公式/文字、E~G 列三期数据，G 列之后为辅助列；
+财务指标 Sheet 的表头行位置可配置，模拟各家底稿表头位置不一的情况。
+"""
+import os
+import sys
+
+import numpy as np
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_loader import SHEET_CONFIG
+
+DATE_HEADERS = ["【2024年末】", "【2023年末】", "【2022年末】"]
+
+CURRENT_ASSETS = ["货币资金", "交易性金融资产", "应收票据", "应收账款", "预付款项", "其他应收款", "存货", "其他流动资产"]
+NON_CURRENT_ASSETS = ["长期股权投资", "投资性房地产", "固定资产", "在建工程", "无形资产", "长期待摊费用", "递延所得税资产"]
+CURRENT_LIABS = ["短期借款", "应付票据", "应付账款", "合同负债", "应付职工薪酬", "应交税费", "其他应付款", "一年内到期的非流动负债"]
+NON_CURRENT_LIABS = ["长期借款", "应付债券", "长期应付款", "递延收益"]
+EQUITY = ["实收资本", "资本公积", "盈余公积", "未分配利润"]
+EXPENSES = ["税金及附加", "销售费用", "管理费用", "研发费用"]
+
+CASH_SECTIONS = [
+    ("经营", ["销售商品、提供劳务收到的现金", "收到的税费返还", "收到其他与经营活动有关的现金"],
+             ["购买商品、接受劳务支付的现金", "支付给职工以及为职工支付的现金", "支付的各项税费", "支付其他与经营活动有关的现金"]),
+    ("投资", ["收回投资收到的现金", "取得投资收益收到的现金"],
+             ["购建固定资产、无形资产和其他长期资产支付的现金", "投资支付的现金"]),
+    ("筹资", ["吸收投资收到的现金", "取得借款收到的现金"],
+             ["偿还债务支付的现金", "分配股利、利润或偿付利息支付的现金"]),
+]
+
+RATIOS = ["资产负债率", "平均资产负债率", "流动比率", "速动比率", "EBITDA（元）", "EBITDA/全部债务", "EBITDA利息保障倍数"]
+
+
+class _Builder:
+    """生成三期金额、插入填充科目与重名科目"""
+
+    def __init__(self, rng, n_rows, dup_names):
+        self.rng = rng
+        self.n_rows = n_rows
+        self.dup_names = dup_names
+
+    def amounts(self, low=1e3, high=1e6):
+        return [round(float(v), 2) for v in self.rng.uniform(low, high, 3)]
+
+    def section(self, subjects, prefix, share):
+        """真实科目 + 按 share 比例分配的填充科目 + 重名科目，返回 [(科目, 三期金额)]"""
+        n_filler = int(self.n_rows * share)
+        n_dup = int(self.dup_names * share + 0.5)
+        names = list(subjects) + [f"{prefix}补充科目{i}" for i in range(n_filler)]
+        names += [subjects[i % len(subjects)] for i in range(n_dup)]
+        return [(name, self.amounts()) for name in names]
+
+
+def _total(rows):
+    return [round(sum(vals[i] for _, vals in rows), 2) for i in range(3)]
+
+
+def _write_statement(ws, rows, helper_cols):
+    ws.append(["编制单位：合成样本公司", None, None, None, None, None, None])
+    ws.append(["单位：万元"])
+    ws.append(["项目", "附注", "审定数", "调整说明", *DATE_HEADERS, *[f"辅助列{i}" for i in range(helper_cols)]])
+    for r_idx, (name, vals) in enumerate(rows, start=4):
+        helpers = [f"=E{r_idx}-F{r_idx}" if i % 2 == 0 else "核对" for i in range(helper_cols)]
+        ws.append([name, None, f"=E{r_idx}", "—", *(vals or [None] * 3), *helpers])
+
+
+def _balance_sheet_rows(b, sections, total_name):
+    """[(分组标题, 科目, 前缀, 小计名称)] -> 行列表，末行为合计"""
+    rows, subtotals = [], []
+    for title, subjects, prefix, subtotal_name in sections:
+        body = b.section(subjects, prefix, 1 / len(sections))
+        subtotal = _total(body)
+        rows += [(title, None)] + body + [(subtotal_name, subtotal)]
+        subtotals.append(subtotal)
+    rows.append((total_name, [round(sum(v[i] for v in subtotals), 2) for i in range(3)]))
+    return rows
+
+
+def _profit_rows(b):
+    revenue, cost = b.amounts(5e5, 1e6), b.amounts(2e5, 4e5)
+    expenses = [(name, b.amounts(1e3, 5e4)) for name in EXPENSES]
+    interest = b.amounts(1e3, 5e3)
+    finance = [round(v + 2e3, 2) for v in interest]
+    others = b.section(["其他收益"], "损益", 1.0)
+    op_profit = [round(revenue[i] - cost[i] - sum(v[i] for _, v in expenses) - finance[i], 2) for i in range(3)]
+    net = [round(v * 0.75, 2) for v in op_profit]
+    return ([("一、营业总收入", revenue), ("其中：营业收入", revenue), ("二、营业总成本", b.amounts()), ("其中：营业成本", cost)]
+            + expenses + [("财务费用", finance), ("其中：利息费用", interest)] + others
+            + [("三、营业利润", op_profit), ("加：营业外收入", b.amounts(0, 100)), ("减：营业外支出", b.amounts(0, 100)),
+               ("四、利润总额", op_profit), ("五、净利润", net)])
+
+
+def _cash_rows(b):
+    rows, nets = [], []
+    for idx, (name, inflows, outflows) in enumerate(CASH_SECTIONS):
+        head = ["一", "二", "三"][idx]
+        rows.append((f"{head}、{name}活动产生的现金流量：", None))
+        inflow = b.section(inflows, f"{name}流入", 1 / 6)
+        outflow = b.section(outflows, f"{name}流出", 1 / 6)
+        in_total, out_total = _total(inflow), _total(outflow)
+        net = [round(in_total[i] - out_total[i], 2) for i in range(3)]
+        rows += inflow + [(f"{name}活动现金流入小计", in_total)]
+        rows += outflow + [(f"{name}活动现金流出小计", out_total), (f"{name}活动产生的现金流量净额", net)]
+        nets.append(net)
+    rows.append(("五、现金及现金等价物净增加额", [round(sum(v[i] for v in nets), 2) for i in range(3)]))
+    return rows
+
+
+def make_workbook(path, n_rows=200, helper_cols=4, dup_names=10, ratio_header_row=2, seed=0):
+    """生成一本合成底稿：每张报表约 n_rows 个填充科目，dup_names 个重名科目，
+    G 列之后 helper_cols 个辅助列，财务指标表头位于第 ratio_header_row 行（0 起）"""
+    rng = np.random.default_rng(seed)
+    b = _Builder(rng, n_rows, dup_names)
+    wb = Workbook()
+
+    ws = wb.active
+    ws.title = SHEET_CONFIG["asset"]
+    _write_statement(ws, _balance_sheet_rows(b, [
+        ("流动资产：", CURRENT_ASSETS, "流动资产", "流动资产合计"),
+        ("非流动资产：", NON_CURRENT_ASSETS, "非流动资产", "非流动资产合计"),
+    ], "资产总计"), helper_cols)
+
+    liab_rows = _balance_sheet_rows(b, [
+        ("流动负债：", CURRENT_LIABS, "流动负债", "流动负债合计"),
+        ("非流动负债：", NON_CURRENT_LIABS, "非流动负债", "非流动负债合计"),
+    ], "负债合计")
+    equity = b.section(EQUITY, "权益", 0.1)
+    liab_rows += [("所有者权益：", None)] + equity + [("负债和所有者权益总计", _total(equity))]
+    _write_statement(wb.create_sheet(SHEET_CONFIG["liab"]), liab_rows, helper_cols)
+
+    _write_statement(wb.create_sheet(SHEET_CONFIG["profit"]), _profit_rows(b), helper_cols)
+    _write_statement(wb.create_sheet(SHEET_CONFIG["cash"]), _cash_rows(b), helper_cols)
+
+    ws = wb.create_sheet(SHEET_CONFIG["ratios"])
+    # 表头之上的说明行不含“项目”“指标”字样，避免被 smart_load_ratios 误判为表头
+    for i in range(ratio_header_row):
+        ws.append(["编制单位：合成样本公司" if i == 0 else f"说明{i}"])
+    ws.append(["项目", "计算公式", "2024年末", "2023年末", "2022年末"])
+    fillers = [f"补充比率{i}" for i in range(n_rows // 10)]
+    for name in RATIOS + fillers:
+        low, high = (1e8, 5e9) if "（元）" in name else (0.1, 3.0)
+        ws.append([name, "公式", *[round(float(v), 4) for v in rng.uniform(low, high, 3)]])
+
+    wb.save(path)
+    return path
@@ -0,0 +1,354 @@
+import io
+import logging
+import re
+import threading
+import zipfile
+from concurrent.futures import Future
+
+import pandas as pd
+import streamlit as st
+from lxml import etree
+from openpyxl.cell.cell import ERROR_CODES
+
+import workbook_cache
+import workers
+from instrumentation import count, stage
+from statement_model import DEFAULT_PERIODS, period_columns
+
+logger = logging.getLogger(__name__)
+
+# --- ⚙️ 系统默认配置 (原高级设置内容) ---
+# 由于删除了前端设置入口，此处定义默认值
+DEFAULT_HEADER_ROW = 2  # 第3行
+SHEET_CONFIG = {
+    "asset": "1.合并资产表",
+    "liab": "2.合并负债及权益表",
+    "profit": "3.合并利润表",
+    "cash": "4.合并现金流量表",
+    "ratios": "5-3主要财务指标计算-方案3（专用公司债）"
+}
+# 解析逻辑（读取列、规整规则等）或磁盘缓存的内容变更时递增，旧的磁盘缓存随之失效
+LOADER_VERSION = 2
+# ------------------------------------
+
+# ================= Excel 底稿读取 =================
+
+def _notify(message):
+    """页面内用 st.toast 提示；批处理等无 Streamlit 运行时的场景改写日志"""
+    if st.runtime.exists(): st.toast(message)
+    else: logger.info(message)
+
+def extract_date_label(header_str):
+    s = str(header_str).strip()
+    match = re.search(r'[【\[](.*?)[】\]]', s)
+    if match: return match.group(1)
+    year = re.search(r'(\d{4})', s)
+    if year: return f"{year.group(1)}年"
+    return s
+
+def resolve_sheet_name(all_sheet_names, sheet_name, notify=_notify):
+    """精确匹配 Sheet 名，失败时忽略空格再匹配一次"""
+    if sheet_name in all_sheet_names: return sheet_name
+    clean_target = sheet_name.replace(" ", "")
+    for actual_name in all_sheet_names:
+        if actual_name.replace(" ", "") == clean_target:
+            notify(f"⚠️ 自动修正 Sheet 名为：'{actual_name}'")
+            return actual_name
+    return None
+
+# ================= Sheet 清单：只读 xl/workbook.xml =================
+# pd.ExcelFile 打开底稿时 openpyxl 会一并解析样式、共享字符串等全部公共部件，
+# 只为拿到 Sheet 名并不值得；清单只需读取压缩包中两个很小的 XML。
+
+_WORKSHEET_REL = "/worksheet"
+
+def _local_elements(root, name):
+    """按本地名查找元素，兼容 Transitional 与 Strict 两种命名空间"""
+    return (el for el in root.iter() if isinstance(el.tag, str) and etree.QName(el).localname == name)
+
+def read_sheet_names(file_obj):
+    """🔥 只读取 XLSX 压缩包中的 xl/workbook.xml（及其关系文件）列出工作表名，顺序与 ExcelFile.sheet_names 一致
+
+    图表页等非工作表不计入；file_obj 可为路径、字节或文件对象（读完后恢复读取位置）。
+    不是 XLSX 压缩包或清单缺失时返回 None，由调用方回退到 pd.ExcelFile。
+    """
+    if isinstance(file_obj, pd.ExcelFile): return file_obj.sheet_names
+    if isinstance(file_obj, (bytes, bytearray)): file_obj = io.BytesIO(file_obj)
+    pos = file_obj.tell() if hasattr(file_obj, "tell") else None
+    try:
+        with stage("read_sheet_names"), zipfile.ZipFile(file_obj) as zf:
+            workbook = etree.fromstring(zf.read("xl/workbook.xml"))
+            try:
+                rels = etree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+                rel_types = {el.get("Id"): el.get("Type", "") for el in _local_elements(rels, "Relationship")}
+            except KeyError:
+                rel_types = {}
+        names = []
+        for el in _local_elements(workbook, "sheet"):
+            rel_id = next((v for k, v in el.attrib.items() if etree.QName(k).localname == "id"), None)
+            if rel_id in rel_types and not rel_types[rel_id].endswith(_WORKSHEET_REL): continue
+            names.append(el.get("name"))
+        return names
+    except (zipfile.BadZipFile, KeyError, etree.XMLSyntaxError):
+        return None
+    finally:
+        if pos is not None: file_obj.seek(pos)
+
+def missing_sheet_error(key, sheet_name, all_sheet_names):
+    if key == "ratios": return f"未找到 Sheet '{sheet_name}'"
+    return f"未找到 Sheet '{sheet_name}' (现有 Sheet: {all_sheet_names})"
+
+def discover_sheets(file_obj, sheet_config, notify=_notify):
+    """读取清单并解析每个 key 对应的实际 Sheet 名（含忽略空格的修正与提示），
+    返回 ({key: 实际 Sheet 名}, {key: 缺失错误})；缺失的 Sheet 在解析任何数据前即可报错。
+    清单读取失败时返回 None，由调用方按原路径逐个打开 Sheet"""
+    all_sheet_names = read_sheet_names(file_obj)
+    if all_sheet_names is None: return None
+    resolved, missing = {}, {}
+    for key, sheet_name in sheet_config.items():
+        actual = resolve_sheet_name(all_sheet_names, sheet_name, notify)
+        if actual is None: missing[key] = missing_sheet_error(key, sheet_name, all_sheet_names)
+        else: resolved[key] = actual
+    return resolved, missing
+
+def fuzzy_load_excel(file_obj, sheet_name, header_row=None, n_periods=DEFAULT_PERIODS):
+    count("fuzzy_load_excel")
+    try:
+        # 传入已打开的 ExcelFile 时直接复用，避免重复解压、解析整本底稿；
+        # 否则先读清单确认 Sheet 存在，再打开底稿
+        xl = file_obj if isinstance(file_obj, pd.ExcelFile) else None
+        all_sheet_names = read_sheet_names(file_obj) if xl is None else xl.sheet_names
+        if all_sheet_names is None:
+            xl = pd.ExcelFile(file_obj)
+            all_sheet_names = xl.sheet_names
+        target_sheet = resolve_sheet_name(all_sheet_names, sheet_name)
+        
+        if target_sheet is None:
+            return None, all_sheet_names
+        if xl is None: xl = pd.ExcelFile(file_obj)
+
+        # 财务指标表特供逻辑
+        if "财务指标" in sheet_name or "5-3" in sheet_name:
+            return smart_load_ratios(xl, target_sheet, n_periods)
+        
+        return pd.read_excel(xl, sheet_name=target_sheet, header=header_row), None
+
+    except Exception as e:
+        return None, [str(e)]
+
+def smart_load_ratios(file_obj, sheet_name, n_periods=DEFAULT_PERIODS):
+    try:
+        df_raw = pd.read_excel(file_obj, sheet_name=sheet_name, header=None)
+        header_idx = -1
+        for i in range(10):
+            row_values = df_raw.iloc[i].astype(str).values
+            if any("项目" in v or "指标" in v for v in row_values):
+                header_idx = i
+                break
+        if header_idx == -1: header_idx = 1
+        # 直接在已读入的行上切出表头与数据，不再按 header_idx 重新读取一遍 Sheet
+        header_values = df_raw.iloc[header_idx].tolist()
+        df = df_raw.iloc[header_idx + 1:].reset_index(drop=True)
+        df.columns = [c if pd.notna(c) else f"Unnamed: {i}" for i, c in enumerate(header_values)]
+        cols = df.columns.tolist()
+        date_col_indices = []
+        for idx, col_name in enumerate(cols):
+            s = str(col_name)
+            if "年" in s or "T" in s or "202" in s or "期" in s:
+                date_col_indices.append(idx)
+        if len(date_col_indices) >= n_periods:
+            target_cols = [0] + date_col_indices[:n_periods]
+        else:
+            target_cols = [0] + list(range(2, 2 + n_periods))
+        df_final = df.iloc[:, target_cols]
+        orig_cols = df_final.columns.tolist()
+        d_labels = [extract_date_label(c) for c in orig_cols[1:]]
+        periods = period_columns(n_periods)
+        df_final.columns = ['科目'] + periods
+        df_final = df_final.dropna(subset=['科目'])
+        df_final['科目'] = df_final['科目'].astype(str).str.strip()
+        for c in periods:
+            df_final[c] = pd.to_numeric(df_final[c], errors='coerce').fillna(0)
+        df_final.set_index('科目', inplace=True)
+        return df_final, d_labels
+    except Exception as e:
+        raise Exception(f"智能读取失败: {str(e)}")
+
+# 报表 Sheet 只使用 A 列科目 + 自 E 列起的各期数据（模版中的“万元”列，默认 E、F、G 三期）
+def statement_columns(n_periods=DEFAULT_PERIODS):
+    return [0] + list(range(4, 4 + n_periods))
+
+STATEMENT_COLUMNS = statement_columns()
+# 优先使用 openpyxl 只读流式读取；关闭后统一走 pd.read_excel 读取整张表
+USE_STREAMING_LOADER = True
+
+def _convert_cell_value(value):
+    """与 pandas 的 openpyxl 读取规则保持一致：错误值视为空，整数值浮点转为 int"""
+    if value is None or value == "": return None
+    if isinstance(value, str) and value in ERROR_CODES: return None
+    if isinstance(value, float) and value.is_integer(): return int(value)
+    return value
+
+def _dedupe_column_names(names):
+    """与 pd.read_excel 一致的重复列名处理：X, X.1, X.2 ..."""
+    counts = {}
+    result = []
+    for col in names:
+        cur_count = counts.get(col, 0)
+        while cur_count > 0:
+            counts[col] = cur_count + 1
+            col = f"{col}.{cur_count}"
+            cur_count = counts.get(col, 0)
+        result.append(col)
+        counts[col] = cur_count + 1
+    return result
+
+def stream_statement_columns(ws, header_row, usecols=STATEMENT_COLUMNS):
+    """🔥 openpyxl 只读流式逐行读取，仅保留 usecols 指定的列，跳过辅助列与公式列"""
+    max_col = max(usecols) + 1
+    # 只读模式按 <dimension> 标签限定行列范围，标签过期（其他工具写出的文件常见）时会少读行；
+    # 与 pandas 一样先清除，按实际数据逐行读取
+    ws.reset_dimensions()
+    header = next(ws.iter_rows(min_row=header_row + 1, max_row=header_row + 1, values_only=True), None)
+    if header is None: raise ValueError(f"Sheet 不足 {header_row + 1} 行，无法定位表头")
+    header = [_convert_cell_value(v) for v in header]
+    while header and header[-1] is None: header.pop()
+    has_all_cols = len(header) >= max_col
+
+    records = []
+    for r_idx, values in enumerate(ws.iter_rows(max_col=max_col, values_only=True)):
+        if not has_all_cols and _convert_cell_value(values[max_col - 1]) is not None: has_all_cols = True
+        if r_idx <= header_row: continue
+        records.append([_convert_cell_value(values[c]) for c in usecols])
+    if not has_all_cols: raise IndexError("positional indexers are out-of-bounds")
+
+    header += [None] * (max_col - len(header))
+    names = _dedupe_column_names([v if v is not None else f"Unnamed: {i}" for i, v in enumerate(header)])
+    return pd.DataFrame(records, columns=[names[c] for c in usecols])
+
+def stream_load_statement(xl, target_sheet_name, header_row, usecols=STATEMENT_COLUMNS):
+    """流式读取报表 Sheet；无法流式读取时返回 None，由调用方回退到 pandas 读取"""
+    if not USE_STREAMING_LOADER or not isinstance(xl, pd.ExcelFile) or xl.engine != "openpyxl": return None
+    try:
+        target_sheet = resolve_sheet_name(xl.sheet_names, target_sheet_name)
+        if target_sheet is None: return None
+        return stream_statement_columns(xl.book[target_sheet], header_row, usecols)
+    except Exception:
+        return None
+
+def normalize_statement_frame(df):
+    """将 科目 + 各期数据 规整为 科目/T/T_1/T_2… 结构，期数由列数决定"""
+    orig_cols = df.columns.tolist()
+    d_labels = [extract_date_label(c) for c in orig_cols[1:]]
+    periods = period_columns(len(d_labels))
+    df.columns = ['科目'] + periods
+    df = df.dropna(subset=['科目'])
+    df['科目'] = df['科目'].astype(str).str.strip()
+    for c in periods:
+        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    df.set_index('科目', inplace=True)
+    return df, d_labels
+
+def load_statement_sheet(file_obj, target_sheet_name, header_row, n_periods=DEFAULT_PERIODS):
+    """读取报表 Sheet 并规整为 科目/T/T_1/T_2… 结构"""
+    usecols = statement_columns(n_periods)
+    try:
+        df = stream_load_statement(file_obj, target_sheet_name, header_row, usecols)
+        if df is None:
+            count("load_statement_sheet.fallback")
+            # 回退：pandas 读取整张表后再截取前几列 (假设格式标准)
+            df, all_sheets_if_failed = fuzzy_load_excel(file_obj, target_sheet_name, header_row)
+            if df is None: return None, None, f"未找到 Sheet '{target_sheet_name}' (现有 Sheet: {all_sheets_if_failed})"
+            df = df.iloc[:, usecols]
+        df, d_labels = normalize_statement_frame(df)
+        return df, d_labels, None
+    except Exception as e: return None, None, str(e)
+
+def _load_sheet(xl, key, sheet_name, header_row, n_periods=DEFAULT_PERIODS):
+    """从已打开的底稿中读取一个 Sheet，返回 (df, d_labels, err)"""
+    with stage(f"load[{key}]"):
+        if key == "ratios":
+            # 财务指标表通常表头不固定，使用 fuzzy_load_excel 的内部逻辑
+            df, d_labels_or_sheets = fuzzy_load_excel(xl, sheet_name, header_row, n_periods)
+            if df is not None: return df, d_labels_or_sheets, None
+            return None, None, missing_sheet_error(key, sheet_name, d_labels_or_sheets)
+        return load_statement_sheet(xl, sheet_name, header_row, n_periods)
+
+def parse_workbook(file_obj, sheet_config, header_row, n_periods=DEFAULT_PERIODS):
+    """一次性解析底稿中的全部 Sheet，返回 {key: (df, d_labels, err)}；n_periods 为读取的期数"""
+    # 先读清单：缺失的 Sheet 直接报错，全部缺失时不再打开底稿
+    discovered = discover_sheets(file_obj, sheet_config)
+    resolved, missing = discovered if discovered else (dict(sheet_config), {})
+    sheets = {key: (None, None, missing[key]) for key in missing}
+    if resolved:
+        # 整本底稿只打开一次，所有 Sheet 共用同一个 ExcelFile 句柄
+        try: xl = pd.ExcelFile(file_obj)
+        except Exception as e: return {key: (None, None, str(e)) for key in sheet_config}
+        with xl:
+            for key, sheet_name in resolved.items():
+                sheets[key] = _load_sheet(xl, key, sheet_name, header_row, n_periods)
+    return {key: sheets[key] for key in sheet_config}
+
+# ================= 并行加载：每个 Sheet 一个 Future =================
+
+def load_sheet(file_bytes, key, sheet_name, header_row, n_periods=DEFAULT_PERIODS):
+    """工作池入口：独立打开底稿，只解析 key 对应的一个 Sheet；底稿无法打开时与 parse_workbook 一样返回错误信息"""
+    try: xl = pd.ExcelFile(io.BytesIO(file_bytes))
+    except Exception as e: return None, None, str(e)
+    with xl:
+        return _load_sheet(xl, key, sheet_name, header_row, n_periods)
+
+def future_result(future):
+    """等待并取出 (df, d_labels, err)；工作进程异常退出等解析以外的失败同样转为错误信息"""
+    try: return future.result()
+    except Exception as e: return None, None, f"解析任务异常：{e}"
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def _save_when_done(cache_key, futures):
+    """全部 Sheet 解析成功后整本写入磁盘缓存（在最后一个完成的 Future 的回调中执行）；
+    任一 Sheet 出错时不写入：错误可能只是暂时的（如工作进程被终止），不应随缓存固定下来"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]: return
+        if any(f.exception() is not None for f in futures.values()): return
+        workbook = {key: f.result() for key, f in futures.items()}
+        if any(err is not None for _, _, err in workbook.values()): return
+        workbook_cache.save_workbook(cache_key, workbook)
+    for future in futures.values(): future.add_done_callback(on_done)
+
+def submit_workbook(file_bytes, file_hash, sheet_config, header_row, n_periods=DEFAULT_PERIODS,
+                    priority=None, notify=_notify):
+    """🔥 所有 Sheet 同时提交到共用工作池（见 workers.py）并行解析，立即返回 {key: Future}，Future 结果为 (df, d_labels, err)
+
+    调用方只等待自己需要的 Sheet，其余 Sheet 在后台继续解析；priority 指定的 Sheet 最先提交，
+    CPU 核数少于 Sheet 数时也最先解析完成。磁盘缓存命中时返回已完成的 Future，
+    不再解析 XLSX；未命中时存在的 Sheet 全部解析成功后写入磁盘缓存。
+    Sheet 名修正的提示在当前进程通过 notify 发出（工作池中无法显示页面提示）。
+    """
+    # 先读清单（毫秒级）：缺失的 Sheet 立即得到已完成的 Future，修正提示即使命中磁盘缓存也照常发出
+    discovered = discover_sheets(file_bytes, sheet_config, notify)
+    resolved, missing = discovered if discovered else (dict(sheet_config), {})
+    futures = {key: _completed((None, None, missing[key])) for key in missing}
+    if resolved:
+        # 磁盘缓存只保存存在的 Sheet，缺失错误每次由清单得出
+        cache_key = None
+        if workbook_cache.enabled():
+            cache_key = workbook_cache.cache_key(file_hash, LOADER_VERSION, sheet_config=sheet_config,
+                                                 header_row=header_row, n_periods=n_periods)
+            workbook = workbook_cache.load_workbook(cache_key)
+            if workbook is not None and set(workbook) == set(resolved):
+                futures.update({key: _completed(sheet) for key, sheet in workbook.items()})
+                return {key: futures[key] for key in sheet_config}
+        submitted = {}
+        for key in sorted(resolved, key=lambda key: key != priority):
+            submitted[key] = workers.submit(load_sheet, file_bytes, key, resolved[key], header_row, n_periods)
+        futures.update(submitted)
+        if cache_key: _save_when_done(cache_key, submitted)
+    return {key: futures[key] for key in sheet_config}
@@ -0,0 +1,266 @@
+import io
+import re
+from xml.sax.saxutils import escape
+
+import pandas as pd
+from docx import Document
+from docx.shared import Pt, Cm, Emu
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn, nsdecls
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_ROW_HEIGHT_RULE
+
+from instrumentation import stage
+
+# ================= Word / Excel 导出 =================
+
+def set_cell_border(cell, **kwargs):
+    """设置单元格边框"""
+    tc = cell._tc
+    tcPr = tc.get_or_add_tcPr()
+    for border_name in ["top", "left", "bottom", "right", "insideH", "insideV"]:
+        if border_name in kwargs:
+            edge = kwargs[border_name]
+            tcBorders = tcPr.first_child_found_in("w:tcBorders")
+            if tcBorders is None:
+                tcBorders = OxmlElement('w:tcBorders')
+                tcPr.append(tcBorders)
+            border = OxmlElement(f'w:{border_name}')
+            border.set(qn('w:val'), edge.get('val', 'single'))
+            border.set(qn('w:sz'), str(edge.get('sz', 4)))
+            border.set(qn('w:space'), str(edge.get('space', 0)))
+            border.set(qn('w:color'), edge.get('color', 'auto'))
+            tcBorders.append(border)
+
+def _column_widths(num_cols):
+    """动态计算列宽"""
+    if num_cols > 5:
+        first_col_w = Cm(5.0)
+        other_col_w = Cm(2.2)
+    else:
+        first_col_w = Cm(6.0)
+        other_col_w = Cm(3.0)
+    return [first_col_w] + [other_col_w] * (num_cols - 1)
+
+def _is_bold_row(subject_name, bold_rows):
+    if bold_rows and subject_name in bold_rows: return True
+    # 移除了 "活动" 关键词，防止“经营活动现金流入小计”被错误加粗
+    if any(k in subject_name for k in ["合计", "总计", "净额", "净增加额", "构成"]): return True
+    return subject_name.endswith("：") or subject_name.endswith(":")
+
+def _new_document():
+    """窄边距、宋体 / Times New Roman 五号正文的空白文档"""
+    doc = Document()
+
+    # 设置页边距为窄边距
+    section = doc.sections[0]
+    section.left_margin = Cm(1.27)
+    section.right_margin = Cm(1.27)
+    section.top_margin = Cm(1.27)
+    section.bottom_margin = Cm(1.27)
+
+    style = doc.styles['Normal']
+    style.font.name = 'Times New Roman'
+    style.element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+    style.font.size = Pt(10.5)
+    return doc
+
+def _add_heading(doc, title, level=1, center=True):
+    """黑色加粗、中西文字体与正文一致的标题"""
+    heading = doc.add_heading(title, level=level)
+    if center: heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in heading.runs:
+        run.font.name = 'Times New Roman'
+        run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+        run.font.bold = True
+        run.font.color.rgb = None
+    return heading
+
+def create_word_table_file(df, title="数据表", bold_rows=None, fast=True):
+    """🔥 生成精排版 Word 表格 (审计底稿风格)
+
+    fast=True 时一次拼出整张表的 w:tbl（共享边框、段落、字体模板）；
+    fast=False 为逐单元格调用 python-docx 的原实现，两者生成的 document.xml 完全一致。
+    """
+    doc = _new_document()
+    _add_heading(doc, title)
+
+    export_df = df.reset_index()
+    with stage("create_word_table_file"):
+        if fast: _add_table_xml(doc, export_df, bold_rows)
+        else: _add_table_cells(doc, export_df, bold_rows)
+        bio = io.BytesIO()
+        doc.save(bio)
+    bio.seek(0)
+    return bio
+
+def _add_table_cells(doc, export_df, bold_rows):
+    """逐单元格设置格式的原实现"""
+    table = doc.add_table(rows=1, cols=len(export_df.columns))
+    table.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    table.autofit = False
+
+    col_widths = _column_widths(len(export_df.columns))
+
+    for i, width in enumerate(col_widths):
+        for row in table.rows:
+            row.cells[i].width = width
+
+    hdr_cells = table.rows[0].cells
+    table.rows[0].height_rule = WD_ROW_HEIGHT_RULE.AT_LEAST
+    table.rows[0].height = Cm(1.0)
+
+    for i, col_name in enumerate(export_df.columns):
+        cell = hdr_cells[i]
+        cell.text = str(col_name)
+        set_cell_border(cell, top={"val": "single", "sz": 12}, bottom={"val": "single", "sz": 12}, left={"val": "single", "sz": 4}, right={"val": "single", "sz": 4})
+        cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+        paragraph = cell.paragraphs[0]
+        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        # 设置单倍行距，段前段后0，确保垂直居中生效
+        paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
+        paragraph.paragraph_format.space_before = Pt(0)
+        paragraph.paragraph_format.space_after = Pt(0)
+
+        for run in paragraph.runs:
+            run.font.bold = True
+            run.font.size = Pt(10.5)
+            run.font.name = 'Times New Roman'
+            run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+
+    for r_idx, row in export_df.iterrows():
+        row_cells = table.add_row().cells
+        table.rows[r_idx+1].height_rule = WD_ROW_HEIGHT_RULE.AT_LEAST
+        # 设置表格高度最小值为 0.6cm
+        table.rows[r_idx+1].height = Cm(0.6)
+
+        subject_name = str(row.iloc[0]).strip()
+        is_bold = _is_bold_row(subject_name, bold_rows)
+
+        for i, val in enumerate(row):
+            cell = row_cells[i]
+            cell.text = str(val) if pd.notna(val) and val != "" else ""
+            bottom_sz = 12 if r_idx == len(export_df) - 1 else 4
+            set_cell_border(cell, top={"val": "single", "sz": 4}, bottom={"val": "single", "sz": bottom_sz}, left={"val": "single", "sz": 4}, right={"val": "single", "sz": 4})
+            cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+
+            paragraph = cell.paragraphs[0]
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            # 设置单倍行距，段前段后0，确保垂直居中生效
+            paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
+            paragraph.paragraph_format.space_before = Pt(0)
+            paragraph.paragraph_format.space_after = Pt(0)
+
+            for run in paragraph.runs:
+                run.font.size = Pt(10.5)
+                run.font.name = 'Times New Roman'
+                run._element.rPr.rFonts.set(qn('w:eastAsia'), '宋体')
+                if is_bold: run.font.bold = True
+
+# ---- 快速写表：所有单元格共用同一组 XML 片段模板 ----
+_BORDER_XML = '<w:{0} w:val="single" w:sz="{1}" w:space="0" w:color="auto"/>'
+_PPR_XML = '<w:pPr><w:spacing w:line="240" w:lineRule="auto" w:before="0" w:after="0"/><w:jc w:val="center"/></w:pPr>'
+_RPR_XML = '<w:rPr><w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman" w:eastAsia="宋体"/>{0}<w:sz w:val="21"/></w:rPr>'
+_RUN_SPECIALS = re.compile(r'([\t\r\n])')
+
+def _tc_open_xml(width_twips, top_sz, bottom_sz, bold):
+    """单元格开头 (tcPr + pPr + rPr) 模板，同一种格式只生成一次"""
+    borders = "".join(_BORDER_XML.format(name, sz) for name, sz in
+                      (("top", top_sz), ("left", 4), ("bottom", bottom_sz), ("right", 4)))
+    return (f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width_twips}"/><w:tcBorders>{borders}</w:tcBorders>'
+            f'<w:vAlign w:val="center"/></w:tcPr><w:p>{_PPR_XML}<w:r>'
+            + _RPR_XML.format("<w:b/>" if bold else ""))
+
+def _run_content_xml(text):
+    """与 python-docx 设置 cell.text 一致：制表符→w:tab，换行→w:br，首尾空白保留"""
+    parts = []
+    for piece in _RUN_SPECIALS.split(text):
+        if not piece: continue
+        if piece == "\t": parts.append("<w:tab/>")
+        elif piece in "\r\n": parts.append("<w:br/>")
+        elif len(piece.strip()) < len(piece): parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+        else: parts.append(f"<w:t>{escape(piece)}</w:t>")
+    return "".join(parts)
+
+def _add_table_xml(doc, export_df, bold_rows):
+    """一次性拼出整张 w:tbl 并插入文档，不再逐单元格操作 python-docx 对象"""
+    num_cols = len(export_df.columns)
+    # 与 doc.add_table 一致：网格列宽按版心宽度均分，新增行的单元格沿用网格列宽
+    grid_w = Emu(doc._block_width // num_cols).twips
+    hdr_widths = [w.twips for w in _column_widths(num_cols)]
+    row_h_hdr, row_h_body = Cm(1.0).twips, Cm(0.6).twips
+
+    xml = [f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblW w:type="auto" w:w="0"/><w:jc w:val="center"/>'
+           '<w:tblLayout w:type="fixed"/><w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" '
+           'w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>']
+    xml.append(f'<w:gridCol w:w="{grid_w}"/>' * num_cols)
+    xml.append(f'</w:tblGrid><w:tr><w:trPr><w:trHeight w:hRule="atLeast" w:val="{row_h_hdr}"/></w:trPr>')
+    for width, col_name in zip(hdr_widths, export_df.columns):
+        xml.append(_tc_open_xml(width, 12, 12, True) + _run_content_xml(str(col_name)) + "</w:r></w:p></w:tc>")
+    xml.append("</w:tr>")
+
+    templates = {}
+    last_idx = len(export_df) - 1
+    row_open = f'<w:tr><w:trPr><w:trHeight w:hRule="atLeast" w:val="{row_h_body}"/></w:trPr>'
+    for r_idx, row in enumerate(export_df.itertuples(index=False, name=None)):
+        is_bold = _is_bold_row(str(row[0]).strip(), bold_rows)
+        key = (is_bold, r_idx == last_idx)
+        tc_open = templates.get(key)
+        if tc_open is None:
+            tc_open = templates[key] = _tc_open_xml(grid_w, 4, 12 if key[1] else 4, is_bold)
+        xml.append(row_open)
+        for val in row:
+            text = str(val) if pd.notna(val) and val != "" else ""
+            xml.append(tc_open + _run_content_xml(text) + "</w:r></w:p></w:tc>")
+        xml.append("</w:tr>")
+    xml.append("</w:tbl>")
+    doc.element.body._insert_tbl(parse_xml("".join(xml)))
+
+# ---- 完整报告：全部章节的表格与文案写入同一份 Word ----
+_BOLD_MARK = re.compile(r'\*\*(.+?)\*\*')
+
+def _add_text(doc, text):
+    """文案按空行分段，段内单个换行保留为换行符；**加粗** 标记转为加粗文字"""
+    for block in text.split("\n\n"):
+        if not block.strip(): continue
+        paragraph = doc.add_paragraph()
+        for i, piece in enumerate(_BOLD_MARK.split(block)):
+            # split 结果中奇数位是 ** ** 之间的内容
+            if piece: paragraph.add_run(piece).bold = True if i % 2 else None
+
+def create_full_report_file(chapters, title="财务分析报告", on_chapter=None):
+    """🔥 完整报告：chapters 为 [(章节标题, ChapterResult 或 None, 错误信息)]，按顺序写入同一份 Word
+
+    每章依次写入全部表格、综述文案与变动分析文案；on_chapter(i) 在写完第 i 章后调用，用于汇报进度。
+    """
+    doc = _new_document()
+    _add_heading(doc, title, level=0)
+    with stage("create_full_report_file"):
+        for i, (chapter_title, result, err) in enumerate(chapters):
+            _add_heading(doc, chapter_title, level=1, center=False)
+            if result is None:
+                doc.add_paragraph(f"⚠️ 本章未生成：{err}")
+            else:
+                for table_title, df in result.tables.items():
+                    _add_heading(doc, table_title, level=2)
+                    _add_table_xml(doc, df.reset_index(), None)
+                for heading, text in result.texts.items():
+                    _add_heading(doc, heading, level=2, center=False)
+                    _add_text(doc, text)
+                if result.variance:
+                    _add_heading(doc, "变动分析", level=2, center=False)
+                    for variance_title, text in result.variance:
+                        _add_heading(doc, variance_title, level=3, center=False)
+                        _add_text(doc, text)
+            if on_chapter: on_chapter(i)
+        bio = io.BytesIO()
+        doc.save(bio)
+    bio.seek(0)
+    return bio
+
+def create_excel_file(df):
+    output = io.BytesIO()
+    with stage("create_excel_file"), pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='数据明细')
+    output.seek(0)
+    return output
@@ -0,0 +1,171 @@
+import contextvars
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# ================= 性能诊断：分阶段计时 / 峰值内存 / 调用计数 =================
+# 默认关闭：没有进行中的 Recorder 时 stage() / count() 直接返回，几乎没有开销。
+# Recorder 存放在 ContextVar 中，Streamlit 各会话的脚本线程互不干扰。
+# tracemalloc 是进程级的：只有进程内唯一进行中的 Recorder 记录峰值内存，
+# 与其他诊断同时进行过的阶段峰值内存记为空，不把别的会话的内存算进来。
+# 共用工作池中的任务看不到提交方的 ContextVar，由 run_task 在任务自己的 Recorder 中运行，
+# 任务完成时阶段与计数并回提交方的 Recorder（只有用时，没有内存）。
+
+_recorder = contextvars.ContextVar("diagnostics_recorder", default=None)
+_state_lock = threading.Lock()
+_active = 0       # 进行中的 Recorder 数
+_overlaps = 0     # Recorder 同时进行的次数，阶段期间有变化说明内存峰值混入了其他诊断
+
+class Recorder:
+    """一次运行的诊断记录，用 with Recorder(...) 包住需要诊断的代码"""
+
+    def __init__(self, label, trace_memory=True):
+        self.label = label
+        self.trace_memory = trace_memory
+        self.stages = []             # [{'stage', 'depth', 'start_ms', 'ms', 'peak_kb'}]，按阶段结束顺序
+        self.counters = Counter()    # 调用次数、缓存命中 / 未命中
+        self.total_ms = 0.0
+        self._stack = []             # 进行中的阶段：[开始时内存, 阶段内已观测到的峰值, 开始时的 _overlaps]
+        self._depth = 0
+        self._lock = threading.Lock()   # 工作池任务完成的回调在其他线程中并入阶段与计数
+        self._open = False
+
+    def __enter__(self):
+        global _active, _overlaps
+        self._token = _recorder.set(self)
+        with _state_lock:
+            _active += 1
+            if _active > 1: _overlaps += 1
+            self._traces = self.trace_memory and _active == 1
+            self._owns_tracing = self._traces and not tracemalloc.is_tracing()
+            if self._owns_tracing: tracemalloc.start()
+        self._start = time.perf_counter()
+        self._open = True
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        with self._lock: self._open = False
+        with _state_lock:
+            _active -= 1
+            if self._owns_tracing: tracemalloc.stop()
+        _recorder.reset(self._token)
+        return False
+
+    def _enter_stage(self):
+        if not self._traces: return
+        current, peak = tracemalloc.get_traced_memory()
+        # 嵌套阶段会重置峰值，先把外层阶段到目前为止的峰值记下
+        if self._stack: self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._stack.append([current, current, _overlaps if _active == 1 else None])
+
+    def _exit_stage(self):
+        if not self._traces or not self._stack: return None
+        start_mem, seen_peak, overlaps = self._stack.pop()
+        peak = max(seen_peak, tracemalloc.get_traced_memory()[1])
+        if self._stack: self._stack[-1][1] = max(self._stack[-1][1], peak)
+        if overlaps is None or overlaps != _overlaps: return None
+        return round((peak - start_mem) / 1024, 1)
+
+    def merge(self, stages, counters, start):
+        """并入工作池任务记下的阶段与计数；start 为任务 Recorder 的开始时刻，Recorder 已结束时丢弃"""
+        offset = (start - self._start) * 1000
+        with self._lock:
+            if not self._open: return
+            self.stages += [dict(s, start_ms=round(s["start_ms"] + offset, 2)) for s in stages]
+            self.counters.update(counters)
+
+    def to_record(self):
+        """写入 JSON-lines 日志的一条记录"""
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "label": self.label,
+            "total_ms": round(self.total_ms, 2),
+            "stages": self.stages,
+            "counters": dict(self.counters),
+        }
+
+@contextmanager
+def stage(name):
+    """记录一个阶段的用时与相对开始时的峰值内存增量 (KB)；未开启诊断时不做任何事"""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    depth = recorder._depth
+    recorder._depth += 1
+    recorder._enter_stage()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        recorder._depth -= 1
+        with recorder._lock: recorder.stages.append({"stage": name, "depth": depth, "start_ms": round((start - recorder._start) * 1000, 2),
+                                "ms": round(ms, 2), "peak_kb": recorder._exit_stage()})
+
+def count(name, n=1):
+    """计数器加 n；未开启诊断时不做任何事"""
+    recorder = _recorder.get()
+    if recorder is None: return
+    with recorder._lock: recorder.counters[name] += n
+
+def current_recorder():
+    """当前上下文中进行中的 Recorder，未开启诊断时为 None"""
+    return _recorder.get()
+
+class _TaskRecorder(Recorder):
+    """工作池任务内的 Recorder：只记用时与计数，不计入进行中的诊断数，也不碰 tracemalloc"""
+
+    def __init__(self, label):
+        super().__init__(label, trace_memory=False)
+        self._traces = False
+
+    def __enter__(self):
+        self._token = _recorder.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+        _recorder.reset(self._token)
+        return False
+
+def run_task(fn, *args):
+    """工作池入口的包装：在任务自己的 Recorder 中运行 fn，返回 (返回值, 阶段, 计数, 开始时刻)，交给 Recorder.merge"""
+    with _TaskRecorder(getattr(fn, "__name__", "task")) as recorder:
+        value = fn(*args)
+    return value, recorder.stages, dict(recorder.counters), recorder._start
+
+def append_jsonl(path, record):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+# ================= cProfile 单次运行采样 =================
+
+def profile_call(func, *args, top_n=40, **kwargs):
+    """在 cProfile 下运行 func，返回 (func 返回值, .prof 文件字节, 按累计用时排序的前 top_n 行文本摘要)
+
+    .prof 与 Profile.dump_stats 写出的文件格式相同，可用 pstats / snakeviz 打开。
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        value = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    prof_bytes = marshal.dumps(profiler.stats)   # 须在 pstats.Stats 之前序列化：Stats 会取走 profiler.stats
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(top_n)
+    return value, prof_bytes, summary.getvalue()
@@ -0,0 +1,310 @@
+import io
+import math
+import re
+import time
+import zipfile
+from collections import defaultdict
+
+from docx import Document
+from lxml import etree
+
+import workers
+from instrumentation import stage
+
+# ================= Word 附注读取与检索 =================
+
+# 优先直接流式解析 word/document.xml；关闭或解析失败时回退到 python-docx 读取
+USE_STREAMING_NOTES = True
+
+def load_single_word(file_obj):
+    if USE_STREAMING_NOTES:
+        try:
+            return stream_load_word(file_obj), True, ""
+        except Exception:
+            pass
+    return load_word_docx(file_obj)
+
+def load_word_docx(file_obj):
+    """python-docx 构建完整对象模型后逐段落、逐单元格读取的原实现"""
+    try:
+        file_obj.seek(0)
+        doc = Document(file_obj)
+        full_text = []
+        for p in doc.paragraphs:
+            txt = p.text.strip()
+            if len(txt) > 2: full_text.append(txt)
+        for table in doc.tables:
+            for row in table.rows:
+                row_text = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+                if row_text: full_text.append(" | ".join(row_text))
+            full_text.append("\n")
+        return "\n".join(full_text), True, ""
+    except Exception as e:
+        return "", False, f"❌ 读取失败: {str(e)}"
+
+# ---- 流式解析：只读取正文 XML，不构建 python-docx 对象 ----
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY, W_P, W_R, W_HYPERLINK, W_T, W_BR = (_W + t for t in ("body", "p", "r", "hyperlink", "t", "br"))
+W_TBL, W_TR, W_TC, W_TRPR, W_TCPR = (_W + t for t in ("tbl", "tr", "tc", "trPr", "tcPr"))
+W_GRIDBEFORE, W_GRIDSPAN, W_VMERGE, W_VAL, W_TYPE = (_W + t for t in ("gridBefore", "gridSpan", "vMerge", "val", "type"))
+# 与 python-docx Run.text 一致的特殊字符映射，w:br 仅换行符类型输出 \n
+_RUN_SPECIALS = {_W + "tab": "\t", _W + "ptab": "\t", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+def _run_text(r):
+    parts = []
+    for child in r:
+        if child.tag == W_T: parts.append(child.text or "")
+        elif child.tag == W_BR: parts.append("\n" if child.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+        elif child.tag in _RUN_SPECIALS: parts.append(_RUN_SPECIALS[child.tag])
+    return "".join(parts)
+
+def _paragraph_text(p):
+    """与 python-docx Paragraph.text 一致：段落直属的 w:r 以及 w:hyperlink 内的 w:r"""
+    parts = []
+    for child in p:
+        if child.tag == W_R: parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK: parts.extend(_run_text(r) for r in child if r.tag == W_R)
+    return "".join(parts)
+
+def _int_val(parent, tag, default):
+    elem = parent.find(tag) if parent is not None else None
+    return int(elem.get(W_VAL)) if elem is not None else default
+
+def _row_cell_texts(tr, above):
+    """与 python-docx _Row.cells 一致地展开一行单元格文本：横向合并按跨列数重复，
+    纵向合并的后续单元格取上一行同一网格列的文本。above 为上一行 {网格列: (文本, 跨列数)}"""
+    texts, by_offset = [], {}
+    offset = _int_val(tr.find(W_TRPR), W_GRIDBEFORE, 0)
+    for tc in tr:
+        if tc.tag != W_TC: continue
+        tcPr = tc.find(W_TCPR)
+        span = _int_val(tcPr, W_GRIDSPAN, 1)
+        vmerge = tcPr.find(W_VMERGE) if tcPr is not None else None
+        if vmerge is not None and vmerge.get(W_VAL, "continue") == "continue":
+            if offset not in above: raise ValueError("no tc above vertically merged cell")
+            cell = above[offset]
+        else:
+            cell = ("\n".join(_paragraph_text(p) for p in tc if p.tag == W_P), span)
+        by_offset[offset] = cell
+        texts.extend([cell[0]] * cell[1])
+        offset += span
+    return texts, by_offset
+
+def _document_part_name(zf):
+    """从 _rels/.rels 找到正文部件，通常为 word/document.xml"""
+    try:
+        for rel in etree.fromstring(zf.read("_rels/.rels")):
+            if rel.get("Type", "").endswith("/officeDocument"): return rel.get("Target").lstrip("/")
+    except KeyError:
+        pass
+    return "word/document.xml"
+
+def stream_load_word(file_obj):
+    """🔥 增量解析 zip 内的正文 XML，每处理完一个段落 / 表格行就释放对应节点
+
+    输出与 load_word_docx 完全一致（正文段落在前，各表格的行在后），
+    内存只与单个段落、表格行的大小相关，不再随文档页数增长。
+    """
+    file_obj.seek(0)
+    paragraphs, table_rows = [], []
+    above = {}
+    with zipfile.ZipFile(file_obj) as zf, zf.open(_document_part_name(zf)) as xml:
+        for _, elem in etree.iterparse(xml, events=("end",), tag=(W_P, W_TR, W_TBL)):
+            parent = elem.getparent()
+            if elem.tag == W_TR:
+                # 嵌套在单元格里的表格不计入，与 doc.tables 只含正文表格一致
+                if parent.tag != W_TBL or parent.getparent().tag != W_BODY: continue
+                texts, above = _row_cell_texts(elem, above)
+                row_text = [t.strip() for t in texts if t.strip()]
+                if row_text: table_rows.append(" | ".join(row_text))
+            elif parent.tag != W_BODY:
+                continue  # 单元格内的段落随所在行一并处理
+            elif elem.tag == W_P:
+                txt = _paragraph_text(elem).strip()
+                if len(txt) > 2: paragraphs.append(txt)
+            else:
+                table_rows.append("\n")
+                above = {}
+            # 已处理的节点及其之前的兄弟节点不再需要，及时释放
+            elem.clear()
+            while elem.getprevious() is not None: del parent[0]
+    return "\n".join(paragraphs + table_rows)
+
+def _parse_note(name, data):
+    """工作池入口：解析一份附注的原始字节，记录解析用时"""
+    start = time.perf_counter()
+    with stage(f"parse_note[{name}]"):
+        content, ok, err = load_single_word(io.BytesIO(data))
+    return {'source': name, 'content': content, 'ok': ok, 'err': err, 'seconds': time.perf_counter() - start}
+
+def parse_notes(files):
+    """🔥 多份 Word 附注提交到共用工作池（见 workers.py）并行解析，files 为 [(文件名, 字节)]，返回与输入同序的结果列表
+
+    共用工作池只在单线程进程（批处理、基准测试）中是 fork 进程池；Streamlit 服务进程是多线程的，
+    这时退回线程池，解析受 GIL 限制，并行收益有限，主要靠按内容哈希的缓存和流式解析省时间。
+    只有一份附注时直接在当前进程解析。
+    """
+    with stage("parse_notes"):
+        if len(files) <= 1:
+            return [_parse_note(name, data) for name, data in files]
+        futures = [workers.submit(_parse_note, name, data) for name, data in files]
+        return [future.result() for future in futures]
+
+# 每个科目在每份附注中取前 3 处命中，截取命中点前 300 字、后 800 字
+CONTEXT_HITS = 3
+CONTEXT_BEFORE = 300
+CONTEXT_AFTER = 800
+
+def _build_trie(patterns):
+    """科目名称字典树，节点的 None 键存放在此结束的科目"""
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern: node = node.setdefault(ch, {})
+        node[None] = pattern
+    return trie
+
+def find_first_hits(patterns, content, limit=CONTEXT_HITS):
+    """🔥 一次扫描找出所有科目各自的前 limit 处命中位置，返回 {科目: [起始位置]}
+
+    先用正则字符类（C 层）跳到可能的科目首字，再沿字典树向后匹配，同一位置可同时命中
+    “应收账款”“应收账款净额”等互为前缀的科目；同一科目的命中互不重叠，与 re.finditer 一致。
+    所有科目都凑够 limit 处后提前结束扫描。
+    """
+    patterns = {p for p in patterns if p}
+    hits = {p: [] for p in patterns}
+    if not patterns: return hits
+    trie = _build_trie(patterns)
+    first_chars = re.compile("[" + "".join(re.escape(ch) for ch in trie) + "]")
+    last_end = dict.fromkeys(patterns, -1)
+    remaining = len(patterns)
+    n = len(content)
+    for m in first_chars.finditer(content):
+        start = m.start()
+        node, pos = trie[content[start]], start + 1
+        while node is not None:
+            pattern = node.get(None)
+            if pattern is not None:
+                found = hits[pattern]
+                if len(found) < limit and start >= last_end[pattern]:
+                    found.append(start)
+                    last_end[pattern] = start + len(pattern)
+                    if len(found) == limit: remaining -= 1
+            if pos >= n: break
+            node = node.get(content[pos])
+            pos += 1
+        if not remaining: break
+    return hits
+
+def build_context_map(subjects, word_data_list):
+    """对所有科目一次性检索附注，返回 {科目: 附注上下文文案}，未命中的科目不在结果中"""
+    if not word_data_list: return {}
+    clean = {subject: subject.replace(" ", "") for subject in subjects}
+    found_contexts = {}
+    for item in word_data_list:
+        content = item['content']
+        hits = find_first_hits(clean.values(), content)
+        for subject, clean_sub in clean.items():
+            starts = hits.get(clean_sub)
+            if not starts: continue
+            file_context = []
+            for idx in starts:
+                start = max(0, idx - CONTEXT_BEFORE)
+                end = min(len(content), idx + CONTEXT_AFTER)
+                ctx = content[start:end].replace('\n', ' ')
+                file_context.append(f"...{ctx}...")
+            combined_ctx = "\n\n----------\n\n".join(file_context)
+            found_contexts.setdefault(subject, []).append(f"📄 **来源：{item['source']}**\n{combined_ctx}")
+    return {subject: "\n\n====================\n\n".join(ctxs) for subject, ctxs in found_contexts.items()}
+
+def find_context(subject, word_data_list):
+    """单个科目的附注上下文，批量场景请用 build_context_map"""
+    return build_context_map([subject], word_data_list).get(subject, "")
+
+# ================= 附注全文检索 =================
+
+def _normalize(text):
+    """检索前去掉全部空白并转小写，“应收 账款”与“应收账款”视为同一词"""
+    return re.sub(r"\s+", "", text).lower()
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+class NotesIndex:
+    """附注倒排索引：以段落 / 表格行为检索单元，相邻两字 (2-gram) 为词项，中文无需分词器
+
+    上传后构建一次，之后每次查询只做词项倒排表求交集和候选单元校验，不再扫描全文。
+    """
+
+    def __init__(self, word_data_list):
+        self.units = []     # [(来源文件, 段落序号, 原文)]
+        self._texts = []    # 规整后的单元文本，用于校验命中与计算词频
+        postings = defaultdict(set)
+        for item in word_data_list:
+            position = 0
+            for line in item['content'].split("\n"):
+                line = line.strip()
+                if not line: continue
+                position += 1
+                uid = len(self.units)
+                norm = _normalize(line)
+                self.units.append((item['source'], position, line))
+                self._texts.append(norm)
+                for gram in _bigrams(norm): postings[gram].add(uid)
+        self._postings = dict(postings)
+        self._avg_len = sum(map(len, self._texts)) / len(self._texts) if self._texts else 1.0
+
+    def __len__(self):
+        return len(self.units)
+
+    def _candidates(self, term):
+        """可能包含 term 的单元：多字词取各 2-gram 倒排表的交集，单字词退化为逐单元查找"""
+        if len(term) < 2:
+            return {uid for uid, text in enumerate(self._texts) if term in text}
+        lists = sorted((self._postings.get(g, set()) for g in _bigrams(term)), key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result &= ids
+            if not result: break
+        return result
+
+    def search(self, query, limit=10):
+        """按空格拆分为多个词，返回同时包含全部词的单元，按 BM25 简化打分排序
+
+        返回 [{'source', 'position', 'text', 'score'}]，同分时按附注中的先后顺序。
+        """
+        terms = list(dict.fromkeys(t for t in map(_normalize, query.split()) if t))
+        if not terms or not self._texts: return []
+        per_term = [(term, self._candidates(term)) for term in terms]
+        candidates = set.intersection(*(ids for _, ids in per_term))
+        n_units = len(self._texts)
+        scored = []
+        for uid in candidates:
+            text = self._texts[uid]
+            score = 0.0
+            for term, ids in per_term:
+                tf = text.count(term)
+                if not tf: break
+                idf = math.log(1 + n_units / len(ids))
+                score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * len(text) / self._avg_len))
+            else:
+                scored.append((-score, uid))
+        scored.sort()
+        return [{'source': self.units[uid][0], 'position': self.units[uid][1],
+                 'text': self.units[uid][2], 'score': -neg}
+                for neg, uid in scored[:limit]]
+
+def _term_pattern(query):
+    """查询词的匹配正则，规整方式与 NotesIndex 一致：不区分大小写，词内各字之间允许有空白；长词优先"""
+    terms = sorted({t for t in map(_normalize, query.split()) if t}, key=len, reverse=True)
+    if not terms: return None
+    return re.compile("|".join(r"\s*".join(map(re.escape, term)) for term in terms), re.IGNORECASE)
+
+def highlight_snippet(text, query, width=80):
+    """截取首个命中词附近约 width 字，命中词加粗（Markdown）"""
+    pattern = _term_pattern(query)
+    match = pattern.search(text) if pattern else None
+    start = max(0, (match.start() if match else 0) - width // 4)
+    snippet = text[start:start + width]
+    if pattern: snippet = pattern.sub(lambda m: f"**{m.group(0)}**", snippet)
+    return ("..." if start > 0 else "") + snippet + ("..." if start + width < len(text) else "")
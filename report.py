@@ -0,0 +1,26 @@
+"""完整报告：一次解析的底稿跑全部五个章节，所有表格与文案写入同一份 Word"""
+from analysis_engine import CHAPTERS, analyze_workbook
+from exporters import create_full_report_file
+
+REPORT_FILE_NAME = "财务分析报告.docx"
+
+def build_full_report(workbook, word_data_list=None, on_progress=None):
+    """workbook 为 parse_workbook 的结果，返回 .docx 字节
+
+    on_progress(比例, 说明) 在每个步骤开始时调用：先逐章分析，再逐章写入 Word，可在后台线程中运行。
+    """
+    n = len(CHAPTERS)
+    titles = list(CHAPTERS.values())
+
+    def report(done, text):
+        # 共 2n + 1 步：n 章分析、n 章写入、保存文档
+        if on_progress: on_progress(done / (2 * n + 1), text)
+
+    results = analyze_workbook(workbook, word_data_list,
+                               on_chapter=lambda i, key: report(i, f"正在分析：{CHAPTERS[key]}"))
+    report(n, f"正在写入：{titles[0]}")
+    chapters = [(CHAPTERS[key], result, err) for key, (result, err) in results.items()]
+    bio = create_full_report_file(chapters, on_chapter=lambda i: report(n + i + 1, f"正在写入：{titles[i + 1]}"
+                                                                        if i + 1 < n else "正在保存 Word 文档"))
+    if on_progress: on_progress(1.0, "完整报告已生成")
+    return bio.getvalue()
@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ================= 多期报表模型：科目 × 期间的连续 NumPy 矩阵 =================
+# 期间列沿用 T / T_1 / T_2 … 命名，第 0 列为最新一期，期数不限（如 5 年 + 一期）。
+# 变动额、增幅、占比都是整张矩阵一次运算，期数增加不会增加 Python 层的循环次数；
+# 文案统一按时间先后（最早一期在前）叙述。
+
+DEFAULT_PERIODS = 3
+_PERIOD_COLUMN = re.compile(r'T(_\d+)?')
+
+def period_columns(n):
+    """前 n 期的列名：['T', 'T_1', ..., 'T_{n-1}']"""
+    return ['T'] + [f'T_{i}' for i in range(1, n)]
+
+def frame_periods(df):
+    """DataFrame 中的期间列（按 T, T_1, T_2 … 顺序）"""
+    return [c for c in df.columns if isinstance(c, str) and _PERIOD_COLUMN.fullmatch(c)]
+
+def safe_pct_array(num, denom):
+    """safe_pct 的矩阵版：分母为 0 或任一侧为空时取 0"""
+    num, denom = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(denom, dtype=float))
+    valid = (denom != 0) & ~np.isnan(num) & ~np.isnan(denom)
+    return np.divide(num, denom, out=np.zeros(num.shape), where=valid) * 100
+
+def share_array(num, denom):
+    """占比（小数），分母为 0 的期数取 0；与原先逐期 df[period] / total 的写法一致"""
+    num, denom = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(denom, dtype=float))
+    return np.divide(num, denom, out=np.zeros(num.shape), where=denom != 0)
+
+class StatementModel:
+    """一张报表的矩阵表示：subjects 为科目，values[i, j] 为第 i 个科目第 j 期（0 为最新）的金额"""
+
+    def __init__(self, subjects, values, labels=None):
+        self.subjects = pd.Index(subjects)
+        self.values = np.ascontiguousarray(values, dtype=float)
+        if self.values.ndim != 2 or self.values.shape[0] != len(self.subjects):
+            raise ValueError("values 须为 科目数 × 期数 的二维矩阵")
+        self.periods = period_columns(self.values.shape[1])
+        self.labels = list(labels) if labels is not None else list(self.periods)
+
+    @classmethod
+    def from_frame(cls, df, labels=None):
+        periods = period_columns(len(labels)) if labels is not None else frame_periods(df)
+        return cls(df.index, df[periods].to_numpy(dtype=float), labels)
+
+    def non_zero_mask(self):
+        """至少有一期非零的行"""
+        return (self.values != 0).any(axis=1)
+
+# ================= 多期文案片段 =================
+
+def join_periods(items, fmt="{:,.2f}万元", last="和"):
+    """把按 最新→最早 排列的各期数值按时间先后拼成 “A、B和C”"""
+    parts = [fmt.format(v) for v in reversed(list(items))]
+    if len(parts) <= 1: return "".join(parts)
+    return "、".join(parts[:-1]) + last + parts[-1]
+
+def describe_changes_matrix(values, labels, template, sep="；", first_template=None, fields=None):
+    """逐期变动叙述（批量）：values 为 科目数 × 期数 矩阵，返回每行一段文案
+
+    变动额、增幅与方向词整张矩阵一次算出，逐行只剩套模板。按时间先后对每对相邻期数套用 template
+    后以 sep 连接；first_template 用于最早的一对（缺省同 template）。template 可用字段：
+    label（本期）、prev（上一期）、dir（增加/减少）、amount（变动额绝对值）、tag（增幅/降幅）、
+    pct（增幅绝对值 %），以及 fields 中的逐行字段（{字段名: 与行数等长的序列}，如科目名）。
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, len(labels))
+    diffs = values[:, :-1] - values[:, 1:]
+    up = diffs >= 0
+    # 转为 Python 列表后再套模板：逐个格式化 NumPy 标量比原生 float / str 慢得多
+    amounts = np.abs(diffs).tolist()
+    pcts = np.abs(safe_pct_array(diffs, values[:, 1:])).tolist()
+    dirs = np.where(up, "增加", "减少").tolist()
+    tags = np.where(up, "增幅", "降幅").tolist()
+    # 模板与期间标签按时间先后预先排好，逐行不再判断
+    n_pairs = diffs.shape[1]
+    order = range(n_pairs - 1, -1, -1)
+    pair_formats = [(j, (first_template if first_template is not None and j == n_pairs - 1 else template).format,
+                     labels[j], labels[j + 1]) for j in order]
+    fields = fields or {}
+    names = list(fields)
+    texts = []
+    for i, row_fields in enumerate(zip(*fields.values()) if names else ((),) * len(values)):
+        extra = dict(zip(names, row_fields))
+        amount, pct, direction, tag = amounts[i], pcts[i], dirs[i], tags[i]
+        texts.append(sep.join(fmt(label=label, prev=prev, dir=direction[j], amount=amount[j], tag=tag[j],
+                                  pct=pct[j], **extra) for j, fmt, label, prev in pair_formats))
+    return texts
+
+def describe_changes(values, labels, template, sep="；", first_template=None, **fields):
+    """单个科目的逐期变动叙述，参数同 describe_changes_matrix，fields 为单值"""
+    return describe_changes_matrix(values, labels, template, sep, first_template,
+                                   {name: [value] for name, value in fields.items()})[0]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from synthetic import make_workbook
+
+
+@pytest.fixture(autouse=True)
+def isolated_disk_cache(tmp_path, monkeypatch):
+    """磁盘缓存写到每个用例自己的临时目录，不读写用户目录下的缓存"""
+    import workbook_cache
+    monkeypatch.setattr(workbook_cache, "CACHE_DIR", str(tmp_path / "workbook-cache"))
+
+
+@pytest.fixture(scope="session")
+def synthetic_workbook(tmp_path_factory):
+    """按 make_workbook 的参数生成合成底稿，同一组参数在会话内只生成一次"""
+    made = {}
+
+    def make(**kwargs):
+        key = tuple(sorted(kwargs.items()))
+        if key not in made:
+            path = tmp_path_factory.mktemp("workbook") / "底稿.xlsx"
+            make_workbook(str(path), **kwargs)
+            made[key] = str(path)
+        return made[key]
+    return make
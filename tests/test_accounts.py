@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from accounts import load_registry
+from analysis_engine import find_account
+
+
+@pytest.mark.parametrize("label, account_id", [
+    ("负债合计", "负债合计"),
+    ("负债总计", "负债合计"),                      # 别名
+    ("  负债 合计 ", "负债合计"),                   # 空白
+    ("一、营业总收入", "营业总收入"),                # 编号前缀
+    ("(一)营业收入", "营业收入"),
+    ("其中：利息费用", "利息费用"),
+    ("营业收入(万元)", "营业收入"),                  # 单位后缀
+    ("净利润（亏损以“－”号填列）", "净利润"),        # 全角括号
+    ("ＥＢＩＴＤＡ", "EBITDA"),                      # 全角字母
+    ("流动负债合计", "流动负债合计"),
+    ("销售商品提供劳务收到的现金", "销售商品、提供劳务收到的现金"),   # 一次编辑
+    ("经营活动现金流出小记", "经营活动现金流出小计"),
+])
+def test_resolve(label, account_id):
+    assert load_registry().resolve(label) == account_id
+
+
+@pytest.mark.parametrize("label", ["应收账款", "现金流入小计"])
+def test_resolve_does_not_guess(label):
+    """未登记的短科目名不做编辑距离匹配；同时接近两个科目时不猜测"""
+    assert load_registry().resolve(label) is None
+
+
+def test_find_account_does_not_match_substring():
+    """负债合计只取 负债合计 及其别名，不会落到包含该字样的 流动负债合计"""
+    df = pd.DataFrame({"T": [5.0, 3.0, 2.0, 10.0], "T_1": [1.0, 1.0, 1.0, 1.0]},
+                      index=["流动负债合计", "非流动负债合计", "短期借款", "负债合计"])
+    assert find_account(df, "负债合计").name == "负债合计"
+
+
+def test_find_account_prefers_row_with_most_non_zero_periods():
+    df = pd.DataFrame({"T": [5.0, 0.0, 10.0], "T_1": [1.0, 0.0, 1.0]}, index=["流动负债合计", "负债合计", "负债总计"])
+    assert find_account(df, "负债合计")["T"] == 10.0
+
+
+def test_find_account_missing_returns_zero_row():
+    df = pd.DataFrame({"T": [1.0]}, index=["货币资金"])
+    row = find_account(df, "负债合计")
+    assert row.name is None and row.sum() == 0
@@ -0,0 +1,49 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from analysis_engine import analyze_chapter, analyze_workbook
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, parse_workbook
+
+
+def test_duplicate_subjects_each_get_own_variance(synthetic_workbook):
+    """重名科目：各章节照常生成，资产 / 负债的变动分析按行各自成段"""
+    workbook = parse_workbook(synthetic_workbook(n_rows=30, dup_names=6, seed=3), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    results = analyze_workbook(workbook)
+    assert {key: err for key, (_, err) in results.items() if err} == {}
+
+    for key in ("asset", "liab"):
+        df_raw = workbook[key][0]
+        duplicated = set(df_raw.index[df_raw.index.duplicated()])
+        assert duplicated
+        variance = results[key][0].variance
+        titles = Counter(title.split(" (占比")[0] for title, _ in variance)
+        assert any(titles[name] > 1 for name in duplicated)
+        # 同名的每一行各有自己的金额，文案不应重复
+        texts = [text for title, text in variance if title.split(" (占比")[0] in duplicated]
+        assert len(texts) == len(set(texts))
+
+
+def test_liability_total_is_not_current_liabilities():
+    """负债章节以 负债合计 为分母，不会落到排在前面、同样含“负债合计”字样的 流动负债合计"""
+    df = pd.DataFrame({"T": [60.0, 60.0, 40.0, 40.0, 100.0, 200.0],
+                       "T_1": [30.0, 30.0, 30.0, 30.0, 60.0, 150.0],
+                       "T_2": [20.0, 20.0, 20.0, 20.0, 40.0, 90.0]},
+                      index=pd.Index(["短期借款", "流动负债合计", "长期借款", "非流动负债合计", "负债合计", "所有者权益合计"], name="科目"))
+    result = analyze_chapter("liab", df, ["2024年末", "2023年末", "2022年末"])
+    table = result.tables["负债结构情况表"]
+    assert list(table.index) == ["短期借款", "流动负债合计", "长期借款", "非流动负债合计", "负债合计"]
+    assert table.iloc[:, 1].tolist() == ["60.00", "60.00", "40.00", "40.00", "100.00"]
+    assert "负债总额分别为40.00万元、60.00万元和100.00万元" in result.texts["负债综述文案"]
+
+
+@pytest.mark.parametrize("n_periods", [1, 2])
+def test_fewer_periods(synthetic_workbook, n_periods):
+    """只读取一期或两期时各章节照常生成，不访问不存在的上期数据"""
+    path = synthetic_workbook(n_rows=30, dup_names=0, seed=7)
+    workbook = parse_workbook(path, SHEET_CONFIG, DEFAULT_HEADER_ROW, n_periods=n_periods)
+    results = analyze_workbook(workbook)
+    assert {key: err for key, (_, err) in results.items() if err} == {}
+    for key, (result, _) in results.items():
+        assert all(len(df.columns) >= n_periods for df in result.tables.values()), key
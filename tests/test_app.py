@@ -0,0 +1,9 @@
+from test_app_baseline import APP_PATH, render_pages
+
+
+def test_unreadable_workbook_shows_error_on_every_page(tmp_path):
+    path = tmp_path / "broken.xlsx"
+    path.write_bytes(b"not a workbook")
+    for page, items in render_pages(APP_PATH, str(path)).items():
+        assert items["exception"] == [], page
+        assert [e for e in items["error"] if "读取失败：" in e], page
@@ -0,0 +1,90 @@
+"""页面输出与基线版本一致：同一本合成底稿逐页渲染，逐项比较表格与文案
+
+golden/ 下的期望值由重构前的单文件 app.py 渲染录制；负债页在修正负债合计的取数
+（此前误取流动负债合计）之后按当前版本重新录制。
+
+重新录制：python tests/test_app_baseline.py [app.py 路径]
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from analysis_engine import CHAPTERS
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+APP_PATH = os.path.join(os.path.dirname(GOLDEN_DIR), "..", "app.py")
+# 不含重名科目：基线版本遇到重名科目会报错
+WORKBOOKS = {
+    "syn30": dict(n_rows=30, dup_names=0, ratio_header_row=2, seed=7),
+    "syn30_header0": dict(n_rows=30, dup_names=0, ratio_header_row=0, seed=8),
+}
+
+
+def _app(app_path, workbook_path):
+    """以上传的底稿运行 app.py（AppTest 不支持 file_uploader，这里替换为直接返回文件）"""
+    import io
+    import os
+    import sys
+    import streamlit as st
+    sys.path.insert(0, os.path.dirname(app_path))
+
+    class Upload(io.BytesIO):
+        name = os.path.basename(workbook_path)
+        file_id = workbook_path
+
+    with open(workbook_path, "rb") as f: data = f.read()
+
+    def file_uploader(label, *args, **kwargs):
+        if "Excel" in label: return Upload(data)
+        return [] if kwargs.get("accept_multiple_files") else None
+    st.file_uploader = st.sidebar.file_uploader = file_uploader
+    with open(app_path, encoding="utf-8") as f: code = compile(f.read(), app_path, "exec")
+    exec(code, {"__name__": "__main__", "__file__": app_path})
+
+
+def render_pages(app_path, workbook_path):
+    """同一会话依次切换全部章节，返回 {章节: 页面上的报错、表格与文案}"""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_function(_app, args=(os.path.abspath(app_path), workbook_path), default_timeout=120)
+    at.run()
+    pages = {}
+    for page in CHAPTERS.values():
+        at.sidebar.radio[0].set_value(page).run()
+        pages[page] = {"exception": [str(e.value) for e in at.exception],
+                       "error": [e.value for e in at.error],
+                       "code": [c.value for c in at.code],
+                       "dataframe": [d.value.to_csv() for d in at.dataframe]}
+    return pages
+
+
+def golden_path(name):
+    return os.path.join(GOLDEN_DIR, f"{name}.json")
+
+
+@pytest.mark.parametrize("name", WORKBOOKS)
+def test_pages_match_baseline(name, synthetic_workbook):
+    with open(golden_path(name), encoding="utf-8") as f: expected = json.load(f)
+    actual = render_pages(APP_PATH, synthetic_workbook(**WORKBOOKS[name]))
+    for page, items in expected.items():
+        assert actual[page]["exception"] == []
+        for kind in ("error", "code", "dataframe"):
+            assert actual[page][kind] == items[kind], f"{page} {kind}"
+
+
+if __name__ == "__main__":
+    import tempfile
+    sys.path.insert(0, os.path.join(os.path.dirname(GOLDEN_DIR), "..", "benchmarks"))
+    from synthetic import make_workbook
+    app_path = sys.argv[1] if len(sys.argv) > 1 else APP_PATH
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, params in WORKBOOKS.items():
+            workbook_path = os.path.join(tmp, "底稿.xlsx")
+            make_workbook(workbook_path, **params)
+            pages = render_pages(app_path, workbook_path)
+            with open(golden_path(name), "w", encoding="utf-8") as f:
+                json.dump(pages, f, ensure_ascii=False, indent=1)
+            print(name, {page: len(items["code"]) + len(items["dataframe"]) for page, items in pages.items()})
@@ -0,0 +1,58 @@
+"""命令行批处理：按命令行方式运行 batch.py，检查输出文件与退出码
+
+tests/data/底稿.xlsx 是按标准模版生成的 10 行小底稿（五张表齐全，各章节均可生成）。
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, "tests", "data", "底稿.xlsx")
+CHAPTER_TABLES = {
+    "(一) 资产结构分析": ["资产结构情况表"],
+    "(二) 负债结构分析": ["负债结构情况表"],
+    "(三) 现金流量分析": ["现金流量表摘要", "现金流量占比表"],
+    "(四) 财务指标分析": ["主要财务指标表"],
+    "(五) 盈利能力分析": ["盈利能力分析表", "期间费用分析表", "期间费用占营收分析表"],
+}
+
+
+def run_batch(in_dir, out_dir):
+    return subprocess.run([sys.executable, "batch.py", str(in_dir), str(out_dir), "--workers", "2"],
+                          cwd=ROOT, capture_output=True, text=True, timeout=300)
+
+
+def test_writes_every_chapter(tmp_path):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    shutil.copy(SAMPLE, in_dir / "甲公司.xlsx")
+    (in_dir / "~$甲公司.xlsx").write_bytes(b"")     # Excel 的锁文件，应跳过
+    proc = run_batch(in_dir, tmp_path / "out")
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert "[1/1] ✅ 甲公司.xlsx" in proc.stdout
+
+    for chapter, titles in CHAPTER_TABLES.items():
+        chapter_dir = tmp_path / "out" / "甲公司" / chapter
+        expected = {f"{title}{suffix}" for title in titles for suffix in (".docx", ".xlsx")} | {"文案.txt"}
+        assert {p.name for p in chapter_dir.iterdir()} == expected, chapter
+        assert "【变动分析文案】" in (chapter_dir / "文案.txt").read_text(encoding="utf-8"), chapter
+
+
+def test_unreadable_workbook_fails(tmp_path):
+    """一本底稿读取失败时照常输出其他底稿，退出码非零"""
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    shutil.copy(SAMPLE, in_dir / "甲公司.xlsx")
+    (in_dir / "乙公司.xlsx").write_bytes(b"not a workbook")
+    proc = run_batch(in_dir, tmp_path / "out")
+    assert proc.returncode == 1
+    assert "✅ 甲公司.xlsx" in proc.stdout
+    assert "乙公司.xlsx" in proc.stdout and "✅ 乙公司.xlsx" not in proc.stdout
+    assert (tmp_path / "out" / "甲公司" / "(一) 资产结构分析" / "文案.txt").exists()
+
+
+def test_empty_folder_fails(tmp_path):
+    proc = run_batch(tmp_path, tmp_path / "out")
+    assert proc.returncode == 1
+    assert "没有 Excel 底稿" in proc.stdout
@@ -0,0 +1,89 @@
+import os
+import re
+import time
+import zipfile
+
+import openpyxl
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import workbook_cache
+from data_loader import (SHEET_CONFIG, DEFAULT_HEADER_ROW, STATEMENT_COLUMNS, _completed, _save_when_done, future_result,
+                         load_sheet, parse_workbook, stream_load_statement, submit_workbook)
+
+
+def with_stale_dimensions(src, dst, ref="A1:K10"):
+    """把每张 Sheet 的 <dimension> 改成过期的范围（行数远少于实际数据）"""
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'<dimension ref="[^"]*"\s*/>', f'<dimension ref="{ref}"/>'.encode(), data)
+            zout.writestr(item, data)
+
+
+def test_stream_loader_ignores_stale_dimension(synthetic_workbook, tmp_path):
+    path = tmp_path / "stale.xlsx"
+    with_stale_dimensions(synthetic_workbook(n_rows=30, dup_names=0, seed=7), path)
+    with pd.ExcelFile(path) as xl:
+        for key in ("asset", "liab", "profit", "cash"):
+            sheet = SHEET_CONFIG[key]
+            expected = pd.read_excel(path, sheet_name=sheet, header=DEFAULT_HEADER_ROW).iloc[:, STATEMENT_COLUMNS]
+            assert len(expected) > 10
+            assert_frame_equal(stream_load_statement(xl, sheet, DEFAULT_HEADER_ROW), expected)
+
+
+def test_parse_workbook_unreadable_file(tmp_path):
+    path = tmp_path / "broken.xlsx"
+    path.write_bytes(b"not a workbook")
+    workbook = parse_workbook(str(path), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    assert list(workbook) == list(SHEET_CONFIG)
+    assert all(df is None and err for df, _, err in workbook.values())
+
+
+def test_load_sheet_unreadable_bytes():
+    assert load_sheet(b"not a workbook", "asset", SHEET_CONFIG["asset"], DEFAULT_HEADER_ROW)[:2] == (None, None)
+
+
+def test_future_result_turns_worker_failure_into_error():
+    from concurrent.futures import Future
+    from concurrent.futures.process import BrokenProcessPool
+    future = Future()
+    future.set_exception(BrokenProcessPool("terminated abruptly"))
+    df, d_labels, err = future_result(future)
+    assert df is None and "terminated abruptly" in err
+
+
+def test_sheet_errors_are_not_saved_to_disk_cache():
+    ok = (pd.DataFrame({"T": [1.0]}), ["2024年末"], None)
+    _save_when_done("failed", {"asset": _completed(ok), "liab": _completed((None, None, "未找到合计行"))})
+    assert workbook_cache.load_workbook("failed") is None
+    _save_when_done("ok", {"asset": _completed(ok)})
+    assert workbook_cache.load_workbook("ok") is not None
+
+
+def wait_for_disk_cache(timeout=10):
+    """写入在最后一个 Future 完成后的回调中进行，等待缓存目录出现"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.isdir(workbook_cache.CACHE_DIR) and \
+                any(not name.startswith(".tmp-") for name in os.listdir(workbook_cache.CACHE_DIR)): return
+        time.sleep(0.05)
+
+
+def test_missing_sheet_still_uses_disk_cache(synthetic_workbook, tmp_path):
+    """缺失的 Sheet 不写入缓存，也不妨碍其余 Sheet 命中缓存；缺失错误由清单重新得出"""
+    book = openpyxl.load_workbook(synthetic_workbook(n_rows=30, dup_names=0, seed=7))
+    del book[SHEET_CONFIG["cash"]]
+    path = tmp_path / "no_cash.xlsx"
+    book.save(path)
+    data = path.read_bytes()
+
+    parsed = {key: future.result() for key, future in submit_workbook(data, "h", SHEET_CONFIG, DEFAULT_HEADER_ROW).items()}
+    assert parsed["cash"][0] is None and parsed["asset"][2] is None
+    wait_for_disk_cache()
+
+    cached = submit_workbook(data, "h", SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    assert all(future.done() for future in cached.values())
+    assert cached["cash"].result()[2] == parsed["cash"][2]
+    assert_frame_equal(cached["asset"].result()[0], parsed["asset"][0])
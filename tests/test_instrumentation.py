@@ -0,0 +1,125 @@
+import json
+import pstats
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import workers
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, submit_workbook
+from instrumentation import Recorder, append_jsonl, count, profile_call, stage
+
+
+def test_noop_without_recorder():
+    with stage("load"): count("calls")
+
+
+def test_nested_stages_and_counters():
+    with Recorder("page") as rec:
+        count("find_row_fuzzy")
+        with stage("outer"):
+            with stage("inner"):
+                data = [0] * 500_000
+                count("find_row_fuzzy", 2)
+            del data
+    assert [(s["stage"], s["depth"]) for s in rec.stages] == [("inner", 1), ("outer", 0)]
+    inner, outer = rec.stages
+    # 内层阶段重置了峰值，外层仍记得内层期间的峰值
+    assert inner["peak_kb"] > 3000 and outer["peak_kb"] >= inner["peak_kb"]
+    assert outer["ms"] >= inner["ms"] and rec.total_ms >= outer["ms"]
+    assert rec.counters == {"find_row_fuzzy": 3}
+
+
+def test_without_memory_tracing():
+    with Recorder("page", trace_memory=False) as rec:
+        with stage("load"): pass
+    assert rec.stages[0]["peak_kb"] is None
+
+
+def test_other_threads_do_not_record():
+    """Recorder 存放在 ContextVar 中，其他线程（如其他会话的脚本线程）的计数不会混入"""
+    with Recorder("page") as rec:
+        thread = threading.Thread(target=count, args=("calls",))
+        thread.start()
+        thread.join()
+    assert rec.counters == {}
+
+
+def pooled_task(n):
+    with stage("pooled"):
+        count("pooled.calls", n)
+    return n * 2
+
+
+@pytest.mark.parametrize("pool", ["shared", "threads"])
+def test_pooled_tasks_merge_into_recorder(pool, monkeypatch):
+    """共用工作池中的任务看不到提交方的 ContextVar，完成时阶段与计数并回提交方的 Recorder"""
+    if pool == "threads":
+        # Streamlit 服务进程中共用工作池是线程池
+        monkeypatch.setattr(workers, "_executor", ThreadPoolExecutor(max_workers=2))
+    with Recorder("page") as rec:
+        with stage("wait"):
+            results = [future.result() for future in [workers.submit(pooled_task, n) for n in (1, 2, 3)]]
+    assert results == [2, 4, 6]
+    assert rec.counters == {"pooled.calls": 6}
+    pooled = [s for s in rec.stages if s["stage"] == "pooled"]
+    assert len(pooled) == 3 and all(s["peak_kb"] is None for s in pooled)
+    wait = next(s for s in rec.stages if s["stage"] == "wait")
+    # 任务的开始时间换算到提交方 Recorder 的时间轴上
+    assert all(wait["start_ms"] <= s["start_ms"] <= wait["start_ms"] + wait["ms"] for s in pooled)
+
+
+def test_submit_without_recorder_returns_plain_future():
+    assert workers.submit(pooled_task, 4).result() == 8
+
+
+def test_submit_workbook_records_each_sheet(synthetic_workbook):
+    with open(synthetic_workbook(n_rows=10, seed=1), "rb") as f: data = f.read()
+    with Recorder("page") as rec:
+        for future in submit_workbook(data, "h", SHEET_CONFIG, DEFAULT_HEADER_ROW).values(): future.result()
+    assert {f"load[{key}]" for key in SHEET_CONFIG} <= {s["stage"] for s in rec.stages}
+
+
+def test_memory_only_for_single_recording():
+    """tracemalloc 是进程级的：与其他诊断同时进行过的阶段不记峰值内存"""
+    with Recorder("a") as a:
+        with stage("overlapped"):
+            with Recorder("b") as b:
+                with stage("load"): [0] * 100_000
+        with stage("alone"): [0] * 100_000
+    assert a.stages[0]["peak_kb"] is None and b.stages[0]["peak_kb"] is None
+    assert a.stages[1]["peak_kb"] > 300
+
+
+def test_append_jsonl(tmp_path):
+    path = tmp_path / "diagnostics.jsonl"
+    for label in ("资产", "负债"):
+        with Recorder(label) as rec:
+            with stage("analyze[asset]"): count("calls")
+        append_jsonl(path, rec.to_record())
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [r["label"] for r in records] == ["资产", "负债"]
+    assert records[0]["counters"] == {"calls": 1}
+    assert [s["stage"] for s in records[0]["stages"]] == ["analyze[asset]"]
+
+
+def slow_page(n, scale=1):
+    return sum(i * scale for i in range(n))
+
+
+def test_profile_call(tmp_path):
+    value, prof_bytes, summary = profile_call(slow_page, 10_000, scale=2, top_n=5)
+    assert value == slow_page(10_000, scale=2)
+    assert "slow_page" in summary and "cumulative" in summary
+    # .prof 与 dump_stats 的格式相同，pstats 可以直接读取
+    path = tmp_path / "page.prof"
+    path.write_bytes(prof_bytes)
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == "slow_page" for func in stats.stats)
+
+
+def test_profile_call_stops_profiling_on_error():
+    with pytest.raises(ZeroDivisionError):
+        profile_call(lambda: 1 / 0)
+    assert sys.getprofile() is None
@@ -0,0 +1,141 @@
+import io
+import random
+import re
+
+import pytest
+from docx import Document
+
+from bench_notes import make_notes_docx
+from notes import (NotesIndex, build_context_map, find_context, highlight_snippet, load_single_word, load_word_docx,
+                   stream_load_word)
+
+
+def legacy_find_context(subject, word_data_list):
+    """逐科目 re.finditer 扫描的原实现，作为对照"""
+    if not word_data_list: return ""
+    clean_sub = subject.replace(" ", "")
+    found_contexts = []
+    for item in word_data_list:
+        content = item['content']
+        source = item['source']
+        matches = list(re.finditer(re.escape(clean_sub), content))
+        if matches:
+            top_matches = matches[:3]
+            file_context = []
+            for m in top_matches:
+                idx = m.start()
+                start = max(0, idx - 300)
+                end = min(len(content), idx + 800)
+                ctx = content[start:end].replace('\n', ' ')
+                file_context.append(f"...{ctx}...")
+            combined_ctx = "\n\n----------\n\n".join(file_context)
+            found_contexts.append(f"📄 **来源：{source}**\n{combined_ctx}")
+    return "\n\n====================\n\n".join(found_contexts)
+
+
+# 互为前缀、互相包含、可自身重叠（资产资产）以及含正则元字符的科目
+SUBJECTS = ["应收账款", "应收账款净额", "账款", "其他应收款", "资产资产", "长期股权投资", "其他 应付款",
+            "交易性金融资产(注)", "未出现的科目"]
+WORDS = ["应收账款", "应收账款净额", "账款", "其他应收款", "资产", "长期股权", "投资", "其他应付款",
+         "交易性金融资产(注)", "本期", "期末余额", "\n", " | ", "。"]
+
+
+def random_notes(seed, n_docs=3, n_words=2000):
+    rng = random.Random(seed)
+    return [{'source': f"附注{k}.docx", 'content': "".join(rng.choice(WORDS) for _ in range(rng.randint(0, n_words)))}
+            for k in range(n_docs)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_context_map_matches_per_subject_scan(seed):
+    word_data_list = random_notes(seed)
+    expected = {subject: legacy_find_context(subject, word_data_list) for subject in SUBJECTS}
+    assert build_context_map(SUBJECTS, word_data_list) == {s: ctx for s, ctx in expected.items() if ctx}
+    for subject in SUBJECTS:
+        assert find_context(subject, word_data_list) == expected[subject]
+
+
+def test_no_notes():
+    assert build_context_map(SUBJECTS, []) == {}
+    assert find_context("应收账款", []) == ""
+
+
+@pytest.mark.parametrize("query", ["应收账款", "应收 账款", "投资 期末余额", "资产", "款", "交易性金融资产(注)", "未出现"])
+def test_search_returns_every_unit_with_all_terms(query):
+    """倒排表求交集后的结果与逐单元查找一致（不截断时），同一单元不重复返回"""
+    word_data_list = random_notes(0, n_words=300)
+    index = NotesIndex(word_data_list)
+    terms = [t.lower() for t in query.split()]
+    expected = [(source, position, text) for source, position, text in index.units
+                if all(t in "".join(text.split()).lower() for t in terms)]
+    hits = index.search(query, limit=len(index))
+    assert sorted((h["source"], h["position"], h["text"]) for h in hits) == sorted(expected)
+
+
+def test_search_ranking():
+    """词频高、单元短的排在前面；同分按附注中的先后顺序；position 为文件内的非空行序号"""
+    index = NotesIndex([
+        {"source": "附注A.docx", "content": "应收账款\n\n本期期末应收账款余额较上年末有所增加，主要系销售规模扩大所致\n应收账款应收账款 本期"},
+        {"source": "附注B.docx", "content": "短期借款 | 300\n应收账款"},
+    ])
+    hits = index.search("应收账款")
+    assert [(h["source"], h["position"]) for h in hits] == [
+        ("附注A.docx", 3), ("附注A.docx", 1), ("附注B.docx", 2), ("附注A.docx", 2)]
+    assert hits[1]["score"] == hits[2]["score"] > hits[3]["score"]
+    assert [h["position"] for h in index.search("应收账款 增加")] == [2]
+    assert index.search("应收账款", limit=2) == hits[:2]
+
+
+def edge_case_docx():
+    """短段落、制表符与换行、空行、表格内嵌套表格、横向与纵向合并单元格、相邻两张表格"""
+    doc = Document()
+    doc.add_paragraph("短")
+    run = doc.add_paragraph("一、应收账款").add_run("按账龄")
+    run.add_tab()
+    run.add_text("披露")
+    run.add_break()
+    run.add_text("（续）")
+    doc.add_paragraph("   ")
+    table = doc.add_table(rows=4, cols=3)
+    for r in range(4):
+        for c in range(3): table.cell(r, c).text = f"{r}-{c}" if r != 2 else ""
+    table.cell(0, 0).merge(table.cell(0, 1))
+    table.cell(1, 2).merge(table.cell(3, 2))
+    table.cell(1, 0).add_table(rows=1, cols=2).cell(0, 0).text = "嵌套表格"
+    doc.add_table(rows=2, cols=2).cell(1, 1).text = "第二张表"
+    doc.add_paragraph("表格之后的段落")
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio
+
+
+@pytest.mark.parametrize("make", [edge_case_docx, lambda: make_notes_docx(30, 5)])
+def test_stream_load_word_matches_python_docx(make):
+    bio = make()
+    text, ok, err = load_word_docx(bio)
+    assert ok and err == ""
+    assert stream_load_word(bio) == text
+
+
+def test_load_single_word_falls_back_on_unreadable_file():
+    text, ok, err = load_single_word(io.BytesIO(b"not a docx"))
+    assert (text, ok) == ("", False) and err.startswith("❌ 读取失败")
+
+
+def test_highlight_matches_like_search():
+    """检索忽略大小写和空白，摘要中的加粗也应落在同一处原文上"""
+    text = "本期 EBITDA 较上年增长，主要系应收 账款回款加快所致。"
+    index = NotesIndex([{"source": "附注.docx", "content": text}])
+    query = "ebitda 应收账款"
+    assert [hit["text"] for hit in index.search(query)] == [text]
+    assert highlight_snippet(text, query) == "本期 **EBITDA** 较上年增长，主要系**应收 账款**回款加快所致。"
+
+
+def test_highlight_snippet_window():
+    text = "甲" * 100 + "应收账款" + "乙" * 100
+    snippet = highlight_snippet(text, "应收账款", width=40)
+    assert snippet == "..." + "甲" * 10 + "**应收账款**" + "乙" * 26 + "..."
+
+
+def test_highlight_without_terms():
+    assert highlight_snippet("应收账款", "  ") == "应收账款"
@@ -0,0 +1,31 @@
+import io
+
+from docx import Document
+
+from analysis_engine import CHAPTERS
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, parse_workbook
+from report import build_full_report
+
+
+def test_full_report_progress_and_content(synthetic_workbook):
+    """进度依次经过各章分析、各章写入、保存文档，比例单调递增到 1；读取失败的章节写明原因"""
+    workbook = parse_workbook(synthetic_workbook(n_rows=30, dup_names=0, seed=7), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    workbook["cash"] = (None, None, "未找到 Sheet")
+    progress = []
+    data = build_full_report(workbook, on_progress=lambda fraction, text: progress.append((fraction, text)))
+
+    titles = list(CHAPTERS.values())
+    assert [text for _, text in progress] == ([f"正在分析：{t}" for t in titles] + [f"正在写入：{t}" for t in titles]
+                                              + ["正在保存 Word 文档", "完整报告已生成"])
+    fractions = [fraction for fraction, _ in progress]
+    assert fractions[0] == 0 and fractions[-1] == 1.0
+    assert all(a < b for a, b in zip(fractions, fractions[1:]))
+
+    paragraphs = [p.text for p in Document(io.BytesIO(data)).paragraphs]
+    assert all(title in paragraphs for title in titles)
+    assert "⚠️ 本章未生成：读取失败：未找到 Sheet" in paragraphs
+
+
+def test_full_report_without_progress(synthetic_workbook):
+    workbook = parse_workbook(synthetic_workbook(n_rows=30, dup_names=0, seed=7), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    assert Document(io.BytesIO(build_full_report(workbook))).tables
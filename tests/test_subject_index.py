@@ -0,0 +1,128 @@
+"""SubjectIndex 的查找结果与原先逐次正则扫描的 find_row_fuzzy / find_index_fuzzy 一致"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis_engine import find_row_fuzzy, get_subject_index
+
+
+def legacy_find_row_fuzzy(df, keywords, exclude_keywords=None, default_val=None):
+    """引入 SubjectIndex 之前的实现，作为对照"""
+    if isinstance(keywords, str): keywords = [keywords]
+    clean_index = df.index.astype(str).str.replace(r'\s+', '', regex=True)
+    found_rows = []
+    for kw in keywords:
+        clean_kw = kw.replace(" ", "")
+        mask_exact = clean_index == clean_kw
+        mask_contains = clean_index.str.contains(clean_kw, case=False, na=False)
+        if exclude_keywords:
+            for ex_kw in exclude_keywords:
+                clean_ex = ex_kw.replace(" ", "")
+                mask_contains = mask_contains & (~clean_index.str.contains(clean_ex, case=False, na=False))
+        matched_indices = df.index[mask_exact | mask_contains].tolist()
+        for idx in matched_indices:
+            row = df.loc[idx]
+            if isinstance(row, pd.DataFrame):
+                for _, r in row.iterrows(): found_rows.append(r)
+            else:
+                found_rows.append(row)
+    best_row = None
+    max_non_zeros = -1
+    for row in found_rows:
+        non_zeros = 0
+        if row['T'] != 0 and pd.notna(row['T']): non_zeros += 1
+        if row['T_1'] != 0 and pd.notna(row['T_1']): non_zeros += 1
+        if row['T_2'] != 0 and pd.notna(row['T_2']): non_zeros += 1
+        if non_zeros > max_non_zeros:
+            max_non_zeros = non_zeros
+            best_row = row
+    if best_row is not None: return best_row
+    if default_val is not None: return default_val
+    return pd.Series(0, index=df.columns)
+
+
+def legacy_find_index_fuzzy(df, keywords):
+    if isinstance(keywords, str): keywords = [keywords]
+    clean_index = df.index.astype(str).str.replace(r'\s+', '', regex=True)
+    for kw in keywords:
+        clean_kw = kw.replace(" ", "")
+        mask = clean_index.str.contains(clean_kw, case=False, na=False)
+        if mask.any(): return df.index.get_loc(df.index[mask][0])
+    return None
+
+
+NAMES = ["货币资金", "应收账款", "其他应收款", "应收 票据", "流动资产合计", "非流动资产合计", "资产总计",
+         "短期借款", "应付账款", "其他应付款", "流动负债合计", "负债合计", "营业收入", "营业成本",
+         "销售费用", "管理费用", "财务费用", "EBITDA", "Ebitda利润率"]
+KEYWORDS = ["应收", "应收账款", "应收票据", "合计", "流动资产合计", "负债 合计", "费用", "ebitda", "不存在",
+            ["营业利润", "营业收入"], ["不存在", "费用", "合计"]]
+EXCLUDES = [None, ["其他"], ["非流动", "流动负债"]]
+
+
+def random_frame(seed, n_rows=40):
+    """科目随机重复（含同名行与只差空白的行），金额随机取 0 / NaN / 非零"""
+    rng = random.Random(seed)
+    names = [rng.choice(NAMES) + rng.choice(["", "", " ", "　"]) for _ in range(n_rows)]
+    values = [[rng.choice([0.0, 0.0, np.nan, rng.uniform(-100, 100)]) for _ in range(3)] for _ in names]
+    return pd.DataFrame(values, index=pd.Index(names, name="科目"), columns=["T", "T_1", "T_2"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_row_fuzzy_matches_legacy(seed):
+    df = random_frame(seed)
+    for keywords in KEYWORDS:
+        for exclude in EXCLUDES:
+            pd.testing.assert_series_equal(find_row_fuzzy(df, keywords, exclude),
+                                           legacy_find_row_fuzzy(df, keywords, exclude))
+    assert find_row_fuzzy(df, "不存在", default_val=-1) == -1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_first_positions_matches_legacy(seed):
+    """first_positions 给出的行位置与原 find_index_fuzzy 逐个关键词扫描的首个命中一致"""
+    df = random_frame(seed)
+    keywords = [kw for kw in KEYWORDS if isinstance(kw, str)]
+    expected = {}
+    for kw in keywords:
+        loc = legacy_find_index_fuzzy(df, kw)
+        if loc is None: continue
+        # 重名科目时 get_loc 返回布尔掩码，首个 True 即首个命中
+        expected[kw] = int(np.flatnonzero(loc)[0]) if isinstance(loc, np.ndarray) else loc
+    assert get_subject_index(df).first_positions(keywords) == expected
+
+
+def test_first_positions_concurrent_first_call():
+    """多个线程同时首次调用 first_positions，结果都与单线程一致"""
+    keywords = [kw for kw in KEYWORDS if isinstance(kw, str)]
+    expected = get_subject_index(random_frame(5, n_rows=300)).first_positions(keywords)
+    for _ in range(5):
+        index = get_subject_index(random_frame(5, n_rows=300))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: index.first_positions(keywords), range(16)))
+        assert all(result == expected for result in results)
+
+
+def test_index_built_once_per_frame():
+    df = random_frame(0)
+    assert get_subject_index(df) is get_subject_index(df)
+    assert get_subject_index(df.copy()) is not get_subject_index(df)
+
+
+def test_best_row_with_many_candidates():
+    """泛关键词命中数百行（含重名）时，argmax 选出的行与逐行比较一致"""
+    df = random_frame(11, n_rows=600)
+    for keywords in (["合计"], ["费用", "应收"], ["资产"]):
+        pd.testing.assert_series_equal(find_row_fuzzy(df, keywords), legacy_find_row_fuzzy(df, keywords))
+
+
+def test_tie_goes_to_first_candidate():
+    """非零期数并列时取先出现的候选：先按关键词顺序，重名科目展开为同名的全部行"""
+    df = pd.DataFrame({"T": [1.0, 5.0, 7.0, 0.0], "T_1": [0.0, 5.0, 7.0, 3.0], "T_2": [0.0, 0.0, 0.0, 3.0]},
+                      index=["其他费用", "管理费用", "其他费用", "财务费用"])
+    assert find_row_fuzzy(df, ["财务费用", "管理费用"])["T"] == 0.0
+    assert find_row_fuzzy(df, ["管理费用", "财务费用"])["T"] == 5.0
+    # 第 0 行命中时展开同名的第 2 行，排在第 1 行之前
+    assert find_row_fuzzy(df, "费用")["T"] == 7.0
@@ -0,0 +1,37 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import workbook_cache
+from data_loader import SHEET_CONFIG, DEFAULT_HEADER_ROW, parse_workbook
+
+
+def test_parquet_round_trip(synthetic_workbook, tmp_path):
+    """写入再读出：DataFrame（含索引与列名）、期间标签与错误信息原样还原"""
+    workbook = parse_workbook(synthetic_workbook(n_rows=30, dup_names=3, seed=5), SHEET_CONFIG, DEFAULT_HEADER_ROW)
+    workbook["missing"] = (None, None, "未找到 Sheet")
+    workbook_cache.save_workbook("k", workbook, cache_dir=str(tmp_path))
+
+    loaded = workbook_cache.load_workbook("k", cache_dir=str(tmp_path))
+    assert list(loaded) == list(workbook)
+    for key, (df, d_labels, err) in workbook.items():
+        loaded_df, loaded_labels, loaded_err = loaded[key]
+        assert (loaded_labels, loaded_err) == (d_labels, err)
+        if df is None: assert loaded_df is None
+        else: assert_frame_equal(loaded_df, df)
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    workbook_cache.save_workbook("k", {"asset": (pd.DataFrame({"T": [1.0]}), ["2024年末"], None)}, cache_dir=str(tmp_path))
+    (tmp_path / "k" / "0.parquet").write_bytes(b"not parquet")
+    assert workbook_cache.load_workbook("k", cache_dir=str(tmp_path)) is None
+    assert not (tmp_path / "k").exists()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    df = pd.DataFrame({"T": range(1000)})
+    for key in ("old", "new"):
+        workbook_cache.save_workbook(key, {"asset": (df, [], None)}, cache_dir=str(tmp_path), max_bytes=2**30)
+    workbook_cache.load_workbook("new", cache_dir=str(tmp_path))
+    size = workbook_cache._entry_size(str(tmp_path / "new"))
+    workbook_cache.evict(str(tmp_path), size)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["new"]
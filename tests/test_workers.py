@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import workers
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    """每个用例从没有工作池开始，结束时关闭用例中创建的池"""
+    monkeypatch.setattr(workers, "_executor", None)
+    yield
+    if workers._executor is not None: workers._executor.shutdown()
+
+
+def test_pool_is_created_once_and_reused(fresh_pool):
+    assert workers.get_executor() is workers.get_executor()
+
+
+def test_thread_pool_in_multithreaded_process(fresh_pool, monkeypatch):
+    """Streamlit 服务进程有多个线程，不能 fork"""
+    monkeypatch.setattr(workers.threading, "active_count", lambda: 4)
+    assert isinstance(workers.get_executor(), ThreadPoolExecutor)
+
+
+def test_broken_process_pool_is_replaced(fresh_pool, monkeypatch):
+    monkeypatch.setattr(workers.threading, "active_count", lambda: 1)
+    broken = workers.get_executor()
+    assert isinstance(broken, ProcessPoolExecutor)
+    with pytest.raises(BrokenProcessPool):
+        workers.submit(os._exit, 1).result()
+    assert workers.submit(abs, -1).result() == 1
+    assert workers.get_executor() is not broken
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from instrumentation import count, stage
+
+logger = logging.getLogger(__name__)
+
+# ================= 底稿解析结果的磁盘缓存（Parquet 列式存储） =================
+# 每本底稿一个目录：<文件哈希>-<解析参数摘要>-v<解析器版本>/，内含各 Sheet 的 .parquet 与 meta.json。
+# 服务重启、页面刷新后再次打开同一本底稿直接读取 Parquet，不再解析 XLSX；
+# 总大小超过上限时按最近使用时间（meta.json 的 mtime，读取时更新）淘汰最久未用的底稿。
+
+CACHE_DIR = os.environ.get("FINANCE_COPILOT_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "finance-copilot", "workbooks"))
+# 设为 0 关闭磁盘缓存
+CACHE_MAX_BYTES = int(os.environ.get("FINANCE_COPILOT_CACHE_MB", "512")) * 2**20
+META_FILE = "meta.json"
+# 写入中断遗留的临时目录超过该时长后清理
+STALE_TMP_SECONDS = 3600
+
+def enabled():
+    return CACHE_MAX_BYTES > 0
+
+def cache_key(file_hash, loader_version, **params):
+    """文件哈希 + 影响解析结果的参数（Sheet 配置、表头行、期数等）+ 解析器版本"""
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"{file_hash}-{digest[:12]}-v{loader_version}"
+
+def load_workbook(key, cache_dir=None):
+    """命中时返回与 parse_workbook 相同结构的 {key: (df, d_labels, err)}，未命中或缓存损坏时返回 None"""
+    entry = os.path.join(cache_dir or CACHE_DIR, key)
+    meta_path = os.path.join(entry, META_FILE)
+    if not os.path.exists(meta_path):
+        count("disk_cache.miss")
+        return None
+    try:
+        with stage("disk_cache.load"):
+            with open(meta_path, encoding="utf-8") as f: meta = json.load(f)
+            workbook = {}
+            for sheet in meta["sheets"]:
+                df = pd.read_parquet(os.path.join(entry, sheet["file"])) if sheet["file"] else None
+                workbook[sheet["key"]] = (df, sheet["d_labels"], sheet["err"])
+        os.utime(meta_path)   # 记录最近使用时间
+        count("disk_cache.hit")
+        return workbook
+    except Exception as e:
+        logger.warning("磁盘缓存读取失败，重新解析：%s (%s)", key, e)
+        shutil.rmtree(entry, ignore_errors=True)
+        count("disk_cache.miss")
+        return None
+
+def save_workbook(key, workbook, cache_dir=None, max_bytes=None):
+    """写入缓存后按总大小淘汰旧底稿；写入失败只记日志，不影响分析"""
+    cache_dir = cache_dir or CACHE_DIR
+    try:
+        with stage("disk_cache.save"):
+            os.makedirs(cache_dir, exist_ok=True)
+            # 先写入临时目录再整体改名，其他会话不会读到写了一半的缓存
+            tmp = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+            sheets = []
+            for i, (sheet_key, (df, d_labels, err)) in enumerate(workbook.items()):
+                file_name = f"{i}.parquet" if df is not None else None
+                if df is not None: df.to_parquet(os.path.join(tmp, file_name), engine="pyarrow")
+                sheets.append({"key": sheet_key, "file": file_name, "d_labels": d_labels, "err": err})
+            with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+                json.dump({"sheets": sheets, "created": time.time()}, f, ensure_ascii=False)
+            try:
+                os.rename(tmp, os.path.join(cache_dir, key))
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)   # 其他会话已写入同一本底稿
+        evict(cache_dir, CACHE_MAX_BYTES if max_bytes is None else max_bytes)
+    except Exception as e:
+        logger.warning("磁盘缓存写入失败：%s (%s)", key, e)
+
+def _entry_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def evict(cache_dir, max_bytes):
+    """总大小超过 max_bytes 时，从最久未使用的底稿开始删除"""
+    entries = []
+    now = time.time()
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(".tmp-"):
+            if now - os.path.getmtime(path) > STALE_TMP_SECONDS: shutil.rmtree(path, ignore_errors=True)
+            continue
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path): continue
+        entries.append((os.path.getmtime(meta_path), _entry_size(path), name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes: break
+        shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        count("disk_cache.evict")
+        total -= size
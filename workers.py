@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from instrumentation import current_recorder, run_task
+
+# ================= 共用的解析工作池 =================
+# 底稿各 Sheet 与 Word 附注的解析都提交到同一个模块级工作池：首次使用时创建，之后一直复用，
+# 不会每次上传都新建进程池，也不会留下无人回收的工作进程。
+# 解析以纯 Python 代码为主，线程受 GIL 限制，只有子进程能真正并行；但 fork 只在当前进程只有一个线程时安全：
+# 其他线程持有的锁会原样复制到子进程，子进程可能永远等不到释放。Streamlit 服务进程是多线程的，
+# spawn / forkserver 又会在子进程中重新执行注册为 __main__ 的页面脚本，因此这时改用线程池。
+# 批处理、基准测试等单线程进程中仍使用 fork 进程池。
+
+_executor = None
+_lock = threading.Lock()
+
+def get_executor():
+    """共用的工作池：单线程进程中为 fork 进程池，否则（如 Streamlit 服务进程）为线程池"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            workers = os.cpu_count() or 1
+            if threading.active_count() == 1 and "fork" in multiprocessing.get_all_start_methods():
+                # fork 方式的进程池在第一次提交时一次性启动全部工作进程，之后不再 fork
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parse")
+        return _executor
+
+def _discard(executor):
+    global _executor
+    with _lock:
+        if _executor is executor: _executor = None
+
+def _submit(fn, *args):
+    executor = get_executor()
+    try: return executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _discard(executor)
+        return get_executor().submit(fn, *args)
+
+def submit(fn, *args):
+    """提交到共用工作池；工作进程异常退出使进程池失效时，换一个新池再提交
+
+    开启性能诊断时，任务在工作线程 / 进程中自己记录阶段与计数，完成时并回提交方的 Recorder；
+    返回的 Future 结果与直接提交 fn 相同。
+    """
+    recorder = current_recorder()
+    if recorder is None: return _submit(fn, *args)
+    inner, outer = _submit(run_task, fn, *args), Future()
+    def on_done(future):
+        try: value, stages, counters, start = future.result()
+        except BaseException as e:
+            outer.set_exception(e)
+            return
+        recorder.merge(stages, counters, start)
+        outer.set_result(value)
+    inner.add_done_callback(on_done)
+    return outer